@@ -11,90 +11,202 @@
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import itertools
-from typing import List
+import math
+import os
+import sys
+import time
+from typing import Dict, List
 # import gurobipy as gp
-from gurobipy import *
-import numpy as np
+try:
+    from gurobipy import *
+except ImportError: # Gurobi is needed only for run_IP, the heuristic scheduler works without it
+    Model = None
 import simplejson
 
+import profiling
+import scheduling
+from profiling import stage
+from schedule_store import save_schedules
+
 IP_ABSOLUTE_GAP = 1000 # value in seconds of the absolute gap after achieving which IP solver will terminate
 IP_TIME_LIMIT = 600 # value in seconds of the time limit after which IP solver will terminate
+IP_BACKEND = 'gurobi' if Model is not None else 'cpsat' # 'gurobi' or 'cpsat' (the CP-SAT solver of OR-tools, which needs no license)
+IP_WORKERS = None # Number of threads (search workers) of the IP solver. None means all CPUs
+IP_SYMMETRY_BREAKING = True # If True, jobs are sorted from the longest one and the k-th job may only go to the first k drones
+BENCHMARK_DRONE_COUNTS = [5, 10, 20, 40] # Numbers of drones for which the IP backends are compared by "python assign_tours.py benchmark"
+SCHEDULE_FORMAT = 'npz' # 'npz' stores the tours once and an array of drone indices for every number of drones (see schedule_store.py), 'json' writes the full routes for every number of drones, 'both' writes both files
+SCHEDULER = 'ip' # 'ip' solves the IP when the heuristics are not good enough, 'heuristic' uses only the heuristics from scheduling.py (LPT, MULTIFIT, Karmarkar-Karp and local search) and does not need Gurobi
 
 capacities = [(20, 10), (50, 20), (60, 20), (100, 20), (200, 20), (500, 20), (1000, 1000)] # a list of tuples of the format: (capacity, max point capacity)
 speed_km_h = 60 # Speed of the drones in km/h
 stop_time_min = 15 # Time drones spend in a cell
+max_number_of_drones = 99 # Schedules are computed for every number of drones from 1 to this number
 
 
 stop_time_sec = stop_time_min*60
 speed_m_s = speed_km_h*1000/(60*60)
 
 
-def run_IP(number_of_drones: int, jobs_durations: List[float]):
+def allowed_drones(number_of_drones: int, jobs_durations: List[float], symmetry_breaking: bool = IP_SYMMETRY_BREAKING):
     """
-    Solves Integer Program for Minimum Makespan Scheduling problem using Gurobi solver.
-    It might be not necessary to solve this IP to optimality, therefore we leave IP_ABSOLUTE_GAP parameter which allows
-    solver to stop when the best obtained solution is within IP_ABSOLUTE_GAP from optimality.
+    Lists the drones every job may be assigned to in the IP.
+
+    All drones are identical, so every schedule appears in the IP m! times with the drones relabelled.
+    With symmetry breaking the jobs are sorted from the longest one and the k-th job may only go to the first k drones:
+    the drones of any schedule can be relabelled in the order of their longest jobs, which gives a schedule of this form.
+    :param number_of_drones: Between how many drones the tours will be divided
+    :param jobs_durations: A list of jobs durations
+    :param symmetry_breaking: If False, every job may go to every drone
+    :return: A list with a range of allowed drones for every job
+    """
+    if not symmetry_breaking:
+        return [range(number_of_drones) for _ in jobs_durations]
 
-    Also, we make available an approximation LPT algorithm for this problem which finds solution within 4/3 - 1/3m from the optimum.
-    :param number_of_drones: Between how many drones the tours will be divided. Should be a positive integer number.
-    :param jobs_durations: A list of jobs durations.
-    :return: A dictionary of assignments of drones to jobs (in the format "drone_id: [jobs_ids]") and a list of total jobs durations for every drone.
+    allowed = [None] * len(jobs_durations)
+    for rank, job in enumerate(sorted(range(len(jobs_durations)), key=lambda job: -jobs_durations[job])):
+        allowed[job] = range(min(rank + 1, number_of_drones))
+    return allowed
+
+
+def canonical_assignment(jobs_assignment: Dict[int, List[int]], jobs_durations: List[float]):
     """
-    print(number_of_drones)
+    Relabels the drones of a schedule in the order of their longest jobs, so that it satisfies the symmetry breaking of allowed_drones.
+    """
+    rank = {job: position for position, job in enumerate(sorted(range(len(jobs_durations)), key=lambda job: -jobs_durations[job]))}
+    drone_jobs = sorted((list(assigned) for assigned in jobs_assignment.values() if len(assigned) > 0),
+                        key=lambda assigned: min(rank[int(job)] for job in assigned))
+    return {drone: assigned for drone, assigned in enumerate(drone_jobs)}
+
+
+def _solve_gurobi(number_of_drones, jobs_durations, allowed, initial_assignment, statistics, time_limit):
+    if Model is None:
+        raise ImportError('gurobipy is needed for solving the IP with Gurobi, set IP_BACKEND = "cpsat" or SCHEDULER = "heuristic" instead')
+
     m = Model("Minimum makespan scheduling")
-    drones = range(number_of_drones)
     jobs = range(len(jobs_durations))
-    jobs_to_drones_indices = list(itertools.product(drones, jobs))
+    jobs_to_drones_indices = [(drone, job) for job in jobs for drone in allowed[job]]
 
     jobs_to_drones = m.addVars(jobs_to_drones_indices, name="drone_job", vtype=GRB.BINARY)
     max_time_length = m.addVar(name="max_time_length", vtype=GRB.CONTINUOUS)
-    m.addConstrs((quicksum([jobs_to_drones[(drone, job)] for drone in drones]) == 1 for job in jobs)) #each job is assigned somewhere
-    m.addConstrs((quicksum([jobs_to_drones[(drone, job)]*jobs_durations[job] for job in jobs]) <= max_time_length for drone in drones))
+    m.addConstrs((quicksum([jobs_to_drones[(drone, job)] for drone in allowed[job]]) == 1 for job in jobs)) #each job is assigned somewhere
+    m.addConstrs((quicksum([jobs_to_drones[(drone, job)]*jobs_durations[job] for job in jobs if drone in allowed[job]]) <= max_time_length
+                  for drone in range(number_of_drones)))
 
     m.setObjective(max_time_length, GRB.MINIMIZE)
+
+    if initial_assignment is not None:
+        for drone, drone_jobs in initial_assignment.items():
+            for job in drone_jobs:
+                jobs_to_drones[(int(drone), int(job))].Start = 1
+        max_time_length.Start = max(sum(jobs_durations[job] for job in drone_jobs) for drone_jobs in initial_assignment.values())
     m.Params.MIPGapAbs = IP_ABSOLUTE_GAP
-    m.Params.TimeLimit = IP_TIME_LIMIT
+    m.Params.TimeLimit = time_limit
+    m.Params.Threads = IP_WORKERS or 0
     m.optimize()
 
-    jobs_assignment = {}
+    if statistics is not None:
+        statistics.update({'wall_time': m.Runtime, 'objective': m.ObjVal, 'bound': m.ObjBound})
 
-    for drone in drones:
-        jobs_assignment[drone] = [job for job in jobs if jobs_to_drones[(drone, job)].X >= 0.8]
+    return [(drone, job) for (drone, job) in jobs_to_drones_indices if jobs_to_drones[(drone, job)].X >= 0.8]
 
-    bins = [sum([jobs_durations[job] for job in jobs if jobs_to_drones[(drone, job)].X >= 0.8]) for drone in drones]
 
-    return jobs_assignment, bins
+def _solve_cpsat(number_of_drones, jobs_durations, allowed, initial_assignment, statistics, time_limit):
+    from ortools.sat.python import cp_model
 
+    # CP-SAT works with integers, the durations are rounded to whole seconds
+    durations = [int(round(duration)) for duration in jobs_durations]
+    model = cp_model.CpModel()
+    jobs = range(len(durations))
+    jobs_to_drones = {(drone, job): model.NewBoolVar('drone_job_{}_{}'.format(drone, job)) for job in jobs for drone in allowed[job]}
+    max_time_length = model.NewIntVar(int(math.ceil(lower_bound(number_of_drones, durations))), sum(durations), 'max_time_length')
 
-def lpt(number_of_drones: int, jobs: List[int]):
+    for job in jobs:
+        model.AddExactlyOne(jobs_to_drones[(drone, job)] for drone in allowed[job]) #each job is assigned somewhere
+    for drone in range(number_of_drones):
+        model.Add(sum(jobs_to_drones[(drone, job)] * durations[job] for job in jobs if drone in allowed[job]) <= max_time_length)
+
+    model.Minimize(max_time_length)
+
+    if initial_assignment is not None:
+        hint = {(int(drone), int(job)) for drone, drone_jobs in initial_assignment.items() for job in drone_jobs}
+        for key, variable in jobs_to_drones.items():
+            model.AddHint(variable, key in hint)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.absolute_gap_limit = IP_ABSOLUTE_GAP
+    solver.parameters.num_workers = IP_WORKERS or os.cpu_count() or 1
+    status = solver.Solve(model)
+    if status == cp_model.UNKNOWN and initial_assignment is not None:
+        # the time limit was reached before CP-SAT found a schedule, the warm start is still a valid one
+        print('CP-SAT did not find a schedule for {} drones within the time limit, keeping the initial assignment'.format(number_of_drones))
+        if statistics is not None:
+            statistics.update({'wall_time': solver.WallTime(), 'bound': solver.BestObjectiveBound(),
+                               'objective': max(sum(durations[job] for job in drone_jobs) for drone_jobs in initial_assignment.values())})
+        return [(int(drone), int(job)) for drone, drone_jobs in initial_assignment.items() for job in drone_jobs]
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        raise RuntimeError('CP-SAT did not find a schedule for {} drones: {}'.format(number_of_drones, solver.StatusName(status)))
+
+    if statistics is not None:
+        statistics.update({'wall_time': solver.WallTime(), 'objective': solver.ObjectiveValue(), 'bound': solver.BestObjectiveBound()})
+
+    return [key for key, variable in jobs_to_drones.items() if solver.Value(variable)]
+
+
+IP_BACKENDS = {
+    'gurobi': _solve_gurobi,
+    'cpsat': _solve_cpsat,
+}
+
+
+def run_IP(number_of_drones: int, jobs_durations: List[float], initial_assignment: Dict[int, List[int]] = None,
+           backend: str = None, symmetry_breaking: bool = IP_SYMMETRY_BREAKING, statistics: dict = None, time_limit: float = None):
     """
-    Does the same as run_IP, but instead of solving IP, it runs Longest Processing Time algorithm which gives
-    a solution within 4/3 - 1/(3m) from the optimum, where m is the number of drones.
+    Solves Integer Program for Minimum Makespan Scheduling problem using Gurobi or the CP-SAT solver of OR-tools.
+    It might be not necessary to solve this IP to optimality, therefore we leave IP_ABSOLUTE_GAP parameter which allows
+    solver to stop when the best obtained solution is within IP_ABSOLUTE_GAP from optimality.
+
+    Also, we make available an approximation LPT algorithm for this problem which finds solution within 4/3 - 1/3m from the optimum.
     :param number_of_drones: Between how many drones the tours will be divided. Should be a positive integer number.
     :param jobs_durations: A list of jobs durations.
+    :param initial_assignment: An assignment (in the same format as returned) used as the starting solution of the solver. Default: None
+    :param backend: "gurobi" or "cpsat". Default: IP_BACKEND
+    :param symmetry_breaking: If True, the k-th longest job may only be assigned to the first k drones (see allowed_drones)
+    :param statistics: If a dictionary is given, the wall time, the objective and the lower bound reported by the solver are stored in it
+    :param time_limit: Time limit of the solver in seconds. Default: IP_TIME_LIMIT
     :return: A dictionary of assignments of drones to jobs (in the format "drone_id: [jobs_ids]") and a list of total jobs durations for every drone.
     """
-    bins = np.zeros(number_of_drones)
-    jobs_assignment = {}
+    print(number_of_drones)
+    backend = backend or IP_BACKEND
+    if backend not in IP_BACKENDS:
+        raise ValueError('Unknown IP backend "{}", use one of: {}'.format(backend, ', '.join(IP_BACKENDS)))
 
-    original_indices = np.argsort(jobs)[::-1]
-    sorted_jobs = np.sort(jobs)[::-1]
+    allowed = allowed_drones(number_of_drones, jobs_durations, symmetry_breaking)
+    if initial_assignment is not None and symmetry_breaking:
+        initial_assignment = canonical_assignment(initial_assignment, jobs_durations)
 
-    for i in range(len(original_indices)):
-        job_length = sorted_jobs[i]
-        job_original_index = original_indices[i]
+    assigned = IP_BACKENDS[backend](number_of_drones, jobs_durations, allowed, initial_assignment, statistics,
+                                    time_limit if time_limit is not None else IP_TIME_LIMIT)
 
-        min_bin_index = np.argmin(bins)
+    jobs_assignment = {drone: [] for drone in range(number_of_drones)}
+    for drone, job in sorted(assigned, key=lambda x: x[1]):
+        jobs_assignment[drone].append(job)
 
-        bins[min_bin_index] = bins[min_bin_index] + job_length
+    bins = [sum([jobs_durations[job] for job in jobs_assignment[drone]]) for drone in range(number_of_drones)]
 
-        if min_bin_index not in jobs_assignment:
-            jobs_assignment[min_bin_index] = []
+    return jobs_assignment, bins
 
-        jobs_assignment[min_bin_index].append(job_original_index)
 
-    return jobs_assignment, bins.tolist()
+def lpt(number_of_drones: int, jobs: List[int]):
+    """
+    Does the same as run_IP, but instead of solving IP, it runs Longest Processing Time algorithm which gives
+    a solution within 4/3 - 1/(3m) from the optimum, where m is the number of drones.
+    See scheduling.py for this and other heuristics which do not need Gurobi.
+    :param number_of_drones: Between how many drones the tours will be divided. Should be a positive integer number.
+    :param jobs_durations: A list of jobs durations.
+    :return: A dictionary of assignments of drones to jobs (in the format "drone_id: [jobs_ids]") and a list of total jobs durations for every drone.
+    """
+    return scheduling.lpt(number_of_drones, jobs)
 
 
 def compute_jobs_durations(tours):
@@ -119,28 +231,181 @@ def compute_jobs_durations(tours):
     return jobs
 
 
+def lower_bound(number_of_drones: int, jobs_durations: List[float]):
+    """
+    Lower bound on the makespan: no schedule is shorter than the longest job or than the average load of a drone.
+    """
+    return max(max(jobs_durations), sum(jobs_durations) / number_of_drones)
+
+
+def makespan(bins: List[float]):
+    return max(bins) if len(bins) > 0 else 0
+
+
+def extend_schedule(jobs_assignment: Dict[int, List[int]], bins: List[float], number_of_drones: int):
+    """
+    Adds idle drones to a schedule, so that it has an entry in jobs_assignment and in bins for every one of number_of_drones drones.
+    """
+    extended = {drone: list(jobs_assignment.get(drone, [])) for drone in range(number_of_drones)}
+    return extended, list(bins) + [0] * (number_of_drones - len(bins))
+
+
+def schedule_drone_counts(jobs: List[float], drone_counts=range(1, max_number_of_drones + 1), scheduler: str = SCHEDULER,
+                          ip_time_limit: float = None):
+    """
+    Computes schedules for every number of drones, solving the IP only when it can improve the solution noticeably.
+
+    For every number of drones m the makespan is bounded from below by lower_bound and from above by the best of
+    the heuristic schedule and the schedule for m - 1 drones (which is also valid for m drones). The heuristic schedule is
+    the LPT one, or the one of scheduling.best_schedule if LPT is not within IP_ABSOLUTE_GAP from the lower bound.
+    If the bounds are within IP_ABSOLUTE_GAP, the IP would not be solved further anyway, so the heuristic schedule is taken.
+    Otherwise the IP is warm-started from the best known schedule.
+    Once the makespan equals the longest job, more drones cannot reduce it, so the same schedule is reused for the
+    remaining numbers of drones.
+
+    :param jobs: A list of jobs durations
+    :param drone_counts: Increasing numbers of drones to compute schedules for
+    :param scheduler: "ip" to solve the IP when the bounds are not tight enough, "heuristic" to never solve it
+    :param ip_time_limit: Time limit of every IP solve in seconds. Default: IP_TIME_LIMIT
+    :return: A list of tuples (number_of_drones, jobs_assignment, bins) and a report dictionary
+    """
+    longest_job = max(jobs)
+    schedules = []
+    previous = None
+    ip_times = []
+    heuristic_time = 0.0
+    # why the IP was not solved for a number of drones
+    skipped = {'longest_job': 0, 'within_gap': 0, 'heuristic_scheduler': 0}
+
+    for number_of_drones in drone_counts:
+        with stage('schedule', number_of_drones=number_of_drones):
+            if previous is not None and makespan(previous[1]) <= longest_job:
+                # the makespan cannot be shorter than the longest job, extra drones stay idle
+                jobs_assignment, bins = extend_schedule(previous[0], previous[1], number_of_drones)
+                skipped['longest_job'] += 1
+            else:
+                start = time.time()
+                best = scheduling.lpt(number_of_drones, jobs)
+                if makespan(best[1]) - lower_bound(number_of_drones, jobs) > IP_ABSOLUTE_GAP:
+                    best = scheduling.best_schedule(number_of_drones, jobs)
+                heuristic_time += time.time() - start
+                if previous is not None and makespan(previous[1]) < makespan(best[1]):
+                    best = extend_schedule(previous[0], previous[1], number_of_drones)
+
+                if scheduler == 'heuristic':
+                    jobs_assignment, bins = best
+                    skipped['heuristic_scheduler'] += 1
+                elif makespan(best[1]) - lower_bound(number_of_drones, jobs) <= IP_ABSOLUTE_GAP:
+                    jobs_assignment, bins = best
+                    skipped['within_gap'] += 1
+                else:
+                    start = time.time()
+                    jobs_assignment, bins = run_IP(number_of_drones, jobs, initial_assignment=best[0], time_limit=ip_time_limit)
+                    ip_times.append(time.time() - start)
+                    if makespan(bins) > makespan(best[1]):
+                        # CP-SAT works with rounded durations and does not have to keep the hint
+                        jobs_assignment, bins = best
+
+        schedules.append((number_of_drones, jobs_assignment, bins))
+        previous = jobs_assignment, bins
+
+    report = {
+        'ip_solved': len(ip_times),
+        'ip_time': sum(ip_times),
+        'heuristic_time': heuristic_time,
+        'skipped_longest_job': skipped['longest_job'],
+        'skipped_within_gap': skipped['within_gap'],
+        'skipped_heuristic_scheduler': skipped['heuristic_scheduler'],
+    }
+    print('IP solved {} times ({:.1f}s), heuristics {:.1f}s. Not solved: {} times the makespan equals the longest tour, '
+          '{} times the heuristics are within IP_ABSOLUTE_GAP, {} times with the heuristic scheduler'.format(
+              report['ip_solved'], report['ip_time'], report['heuristic_time'],
+              skipped['longest_job'], skipped['within_gap'], skipped['heuristic_scheduler']))
+
+    return schedules, report
+
+
 def main():
     for capacity in capacities:
-        with open('./results/capacity_{}_{}.json'.format(capacity[0], capacity[1]), 'r') as f:
+        profiling.reset()
+        with stage('load_tours'), open('./results/capacity_{}_{}.json'.format(capacity[0], capacity[1]), 'r') as f:
             routes = simplejson.load(f)
-
             jobs = compute_jobs_durations(routes)
 
-            results = []
+        schedules, _ = schedule_drone_counts(jobs)
+        # use the following line instead if only the LPT algorithm is preferred
+        # schedules = [(number_of_drones,) + lpt(number_of_drones, jobs) for number_of_drones in range(1, max_number_of_drones + 1)]
+
+        with stage('save'):
+            if SCHEDULE_FORMAT in ('npz', 'both'):
+                save_schedules('./results/schedule_ip_capacity_{}_{}.npz'.format(capacity[0], capacity[1]), routes, schedules)
+
+            if SCHEDULE_FORMAT in ('json', 'both'):
+                results = []
+                for number_of_drones, jobs_assignment, bins in schedules:
+                    results.append({
+                        'number_of_drones': number_of_drones,
+                        'jobs_assignment': [[int(x) for x in value] for (key, value) in jobs_assignment.items()],
+                        'bins': bins,
+                        'routes': [[routes['routes'][route] for route in jobs] for (drone_id, jobs) in jobs_assignment.items()]
+                    })
+
+                with open('./results/schedule_ip_capacity_{}_{}'.format(capacity[0], capacity[1]), 'w') as res_f:
+                    simplejson.dump({'assignments': results, 'all_routes': routes}, res_f)
+
+        profiling.write_report('./results/schedule_ip_capacity_{}_{}_profile.json'.format(capacity[0], capacity[1]),
+                               drones_capacity=capacity[0], max_point_demand=capacity[1], scheduler=SCHEDULER)
+
+
+def benchmark_backends(jobs: List[float], drone_counts=BENCHMARK_DRONE_COUNTS, configurations=None):
+    """
+    Compares the time it takes the IP backends (with and without symmetry breaking) to reach IP_ABSOLUTE_GAP.
+    The solvers are not warm-started, so that they are compared on the IP alone.
+    :param jobs: A list of jobs durations
+    :param drone_counts: Numbers of drones to solve the IP for
+    :param configurations: A list of tuples (backend, symmetry_breaking). Default: all of them, Gurobi only if it is installed
+    :return: A list of dictionaries with the results of every run
+    """
+    if configurations is None:
+        backends = ['gurobi', 'cpsat'] if Model is not None else ['cpsat']
+        configurations = [(backend, symmetry_breaking) for backend in backends for symmetry_breaking in (False, True)]
+
+    results = []
+    for number_of_drones in drone_counts:
+        for backend, symmetry_breaking in configurations:
+            statistics = {}
+            _, bins = run_IP(number_of_drones, jobs, backend=backend, symmetry_breaking=symmetry_breaking, statistics=statistics)
+            gap = makespan(bins) - statistics['bound']
+            results.append({
+                'number_of_drones': number_of_drones,
+                'backend': backend,
+                'symmetry_breaking': symmetry_breaking,
+                'wall_time': statistics['wall_time'],
+                'makespan': makespan(bins),
+                'bound': statistics['bound'],
+                'gap': gap,
+                'reached_gap': gap <= IP_ABSOLUTE_GAP,
+            })
+            print('{} drones, {}{}: {:.1f}s, makespan {:.0f}, gap {:.0f}'.format(
+                number_of_drones, backend, ' with symmetry breaking' if symmetry_breaking else '', statistics['wall_time'], makespan(bins), gap))
+
+    return results
+
+
+def benchmark_main():
+    for capacity in capacities:
+        with open('./results/capacity_{}_{}.json'.format(capacity[0], capacity[1]), 'r') as f:
+            jobs = compute_jobs_durations(simplejson.load(f))
 
-            for number_of_drones in range(1, 100):
-                # jobs_assignment, bins = lpt(number_of_drones, jobs) # use this line instead of the next if LPT algorithm is preferred
-                jobs_assignment, bins = run_IP(number_of_drones, jobs)
-                results.append({
-                    'number_of_drones': number_of_drones,
-                    'jobs_assignment': [[int(x) for x in value] for (key, value) in jobs_assignment.items()],
-                    'bins': bins,
-                    'routes': [[routes['routes'][route] for route in jobs] for (drone_id, jobs) in jobs_assignment.items()]
-                })
+        results = benchmark_backends(jobs)
 
-            with open('./results/schedule_ip_capacity_{}_{}'.format(capacity[0], capacity[1]), 'w') as res_f:
-                simplejson.dump({'assignments': results, 'all_routes': routes}, res_f)
+        with open('./results/ip_benchmark_{}_{}.json'.format(capacity[0], capacity[1]), 'w') as res_f:
+            simplejson.dump({'number_of_jobs': len(jobs), 'ip_absolute_gap': IP_ABSOLUTE_GAP, 'ip_time_limit': IP_TIME_LIMIT,
+                             'runs': results}, res_f, indent=2)
 
 
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark_main()
+    else:
+        main()
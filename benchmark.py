@@ -0,0 +1,283 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+
+import csv
+import math
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import simplejson
+
+import assign_tours
+import compute_tours
+import profiling
+from distances import WGS84_A, build_knn_graph
+from prepare_data import HOSPITAL, compute_distance_matrix, load_data, split_dense_points
+
+
+BENCHMARK_SIZES = [1000, 5000, 10000, 50000] # Numbers of cells of the synthetic grids
+BENCHMARK_DENSITIES = {'rural': 2, 'urban': 20} # Average population of a cell next to the depot, it decreases with the distance from the depot
+BENCHMARK_CELL_SIZE_M = 100 # Size of a grid cell in meters (the same as in centroids100x100.geojson)
+BENCHMARK_SEED = 0 # Seed of the random population, so the same grids are generated on every run
+BENCHMARK_DIRECTORY = './results/benchmark' # Where the grids and the tours of the benchmark are stored
+DENSE_MATRIX_MAX_POINTS = 10000 # Above this number of points the sparse k-nearest-neighbours graph is timed instead of the dense distance matrix
+BENCHMARK_NEIGHBOURS = 20 # Number of neighbours of the sparse graph
+BENCHMARK_CVRP_TIME_LIMIT = 60 # Fixed time budget of the CVRP solver in seconds
+BENCHMARK_CVRP_MAX_NODES = 12000 # The CVRP is solved only for grids with at most this number of nodes after splitting, larger grids are reported as skipped
+BENCHMARK_IP_TIME_LIMIT = BENCHMARK_CVRP_TIME_LIMIT / 6 # Time limit of every IP solve in seconds, so the IP steps stay within the budget of the benchmark
+BENCHMARK_QUALITY_GAPS = [0.05, 0.01] # Time-to-quality is the time until the solution is within these fractions from the final one
+BENCHMARK_TOLERANCE = 0.2 # Relative slowdown (or worse objective) compared to the baseline which is reported as a regression
+
+
+def grid_filename(cells, density):
+    return os.path.join(BENCHMARK_DIRECTORY, 'grid_{}_{}.geojson'.format(cells, density))
+
+
+def generate_grid(filename, cells, mean_population, seed=BENCHMARK_SEED, cell_size=BENCHMARK_CELL_SIZE_M):
+    """
+    Writes a square grid of cells around HOSPITAL to a geojson file in the format of centroids100x100.geojson.
+    The population of a cell is drawn from a Poisson distribution whose mean falls exponentially with the distance
+    from the depot (to a tenth at the border of the grid), so the grid has a dense centre and sparse outskirts.
+    Cells without population are kept in the file, as in the real data.
+
+    :param filename: Path of the geojson file
+    :param cells: Number of cells (rounded to a square grid)
+    :param mean_population: Average population of a cell next to the depot
+    :param seed: Seed of the random generator
+    :param cell_size: Size of a cell in meters
+    :return: The number of cells with population
+    """
+    side = int(math.ceil(math.sqrt(cells)))
+    offsets = (np.arange(side) - (side - 1) / 2) * cell_size
+    x, y = [a.ravel()[:cells] for a in np.meshgrid(offsets, offsets)]
+    distance = np.hypot(x, y)
+    mean = mean_population * np.exp(-math.log(10) * distance / max(1.0, distance.max()))
+    population = np.random.default_rng(seed).poisson(mean)
+
+    lats = HOSPITAL['lat'] + np.degrees(y / WGS84_A)
+    lons = HOSPITAL['lon'] + np.degrees(x / (WGS84_A * math.cos(math.radians(HOSPITAL['lat']))))
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w') as f:
+        f.write('{\n"type": "FeatureCollection",\n"name": "grid_%d",\n"features": [\n' % cells)
+        for i in range(cells):
+            f.write('{ "type": "Feature", "properties": { "TotBef": %d }, "geometry": { "type": "Point", "coordinates": [ %r, %r ] } }%s\n'
+                    % (population[i], float(lons[i]), float(lats[i]), ',' if i < cells - 1 else ''))
+        f.write(']\n}\n')
+
+    return int((population > 0).sum())
+
+
+def _timing(record):
+    return {key: record[key] for key in ('wall_time', 'cpu_time', 'children_cpu_time', 'peak_rss_mb')}
+
+
+def time_to_quality(trace_filename, gaps=BENCHMARK_QUALITY_GAPS):
+    """
+    Reads the trace of the CVRP solver and finds how fast it converged.
+    The decomposition, multilevel and portfolio modes of compute_tours.py do not write the trace, an empty dictionary is then returned.
+    :param trace_filename: The trace written by compute_tours.SolutionRecorder
+    :param gaps: Fractions from the final objective
+    :return: A dictionary with the final objective, the time to the first solution and the time to get within every gap
+    """
+    if not os.path.exists(trace_filename):
+        return {}
+
+    with open(trace_filename, 'r') as f:
+        rows = [(int(row['attempt']), float(row['elapsed']), float(row['best_objective'])) for row in csv.DictReader(f)]
+    if not rows:
+        return {}
+    # only the last attempt (with the final number of vehicles) gives the tours
+    last_attempt = rows[-1][0]
+    rows = [(elapsed, objective) for attempt, elapsed, objective in rows if attempt == last_attempt]
+
+    final = rows[-1][1]
+    result = {'objective': final, 'first_solution_time': rows[0][0], 'number_of_solutions': len(rows)}
+    for gap in gaps:
+        result['time_to_{}'.format(gap)] = next(elapsed for elapsed, objective in rows if objective <= final * (1 + gap))
+    return result
+
+
+def benchmark_grid(cells, density, mean_population):
+    """
+    Times the pipeline on one synthetic grid: the distance matrix (or the sparse graph for large grids),
+    splitting of dense points, the CVRP under a fixed time budget and the assignment of the tours for the drone sweep.
+    :return: A list of result dictionaries, one for every step (and number of drones)
+    """
+    filename = grid_filename(cells, density)
+    generate_grid(filename, cells, mean_population)
+    points = load_data(filename)
+    key = {'cells': cells, 'density': density, 'number_of_points': len(points)}
+    results = []
+
+    if len(points) <= DENSE_MATRIX_MAX_POINTS:
+        with profiling.stage('distance_matrix', **key) as record:
+            distance_matrix = compute_distance_matrix(points)
+    else:
+        with profiling.stage('knn_graph', **key) as record:
+            distance_matrix = build_knn_graph(points.lat, points.lon, BENCHMARK_NEIGHBOURS)
+    results.append(dict(key, step=record['stage'], **_timing(record)))
+
+    with profiling.stage('split', **key) as record:
+        split, split_distance_matrix = split_dense_points(points, distance_matrix, compute_tours.MAX_POINT_DEMAND)
+    results.append(dict(key, step='split', number_of_nodes=len(split), **_timing(record)))
+
+    if len(split) > BENCHMARK_CVRP_MAX_NODES:
+        print('Grid {} {}: {} nodes, the CVRP and the assignment are skipped'.format(cells, density, len(split)))
+        results.append(dict(key, step='cvrp', number_of_nodes=len(split), time_limit=BENCHMARK_CVRP_TIME_LIMIT,
+                            skipped='more than BENCHMARK_CVRP_MAX_NODES = {} nodes'.format(BENCHMARK_CVRP_MAX_NODES)))
+        return results
+
+    tours_filename = os.path.join(BENCHMARK_DIRECTORY, 'capacity_{}_{}_{}_{}.json'.format(
+        compute_tours.DRONES_CAPACITY, compute_tours.MAX_POINT_DEMAND, cells, density))
+    data = compute_tours.build_data_model(split, split_distance_matrix, compute_tours.DRONES_CAPACITY)
+    # time-to-quality is read from the trace, so it is written whatever TRACE is set to
+    trace, compute_tours.TRACE = compute_tours.TRACE, True
+    try:
+        with profiling.stage('cvrp', **key) as record:
+            routes = compute_tours.solve_and_save(data, tours_filename, BENCHMARK_CVRP_TIME_LIMIT)
+    finally:
+        compute_tours.TRACE = trace
+    results.append(dict(key, step='cvrp', number_of_nodes=len(split), time_limit=BENCHMARK_CVRP_TIME_LIMIT,
+                        number_of_routes=len(routes) if routes is not None else None,
+                        **time_to_quality(tours_filename.replace('.json', '_trace.csv')), **_timing(record)))
+    if routes is None:
+        return results
+
+    with open(tours_filename, 'r') as f:
+        jobs = assign_tours.compute_jobs_durations(simplejson.load(f))
+
+    for number_of_drones in assign_tours.BENCHMARK_DRONE_COUNTS:
+        with profiling.stage('lpt', number_of_drones=number_of_drones, **key) as record:
+            jobs_assignment, bins = assign_tours.lpt(number_of_drones, jobs)
+        results.append(dict(key, step='lpt', number_of_drones=number_of_drones, makespan=assign_tours.makespan(bins), **_timing(record)))
+
+        statistics = {}
+        with profiling.stage('ip', number_of_drones=number_of_drones, **key) as record:
+            _, bins = assign_tours.run_IP(number_of_drones, jobs, initial_assignment=jobs_assignment, statistics=statistics,
+                                          time_limit=BENCHMARK_IP_TIME_LIMIT)
+        results.append(dict(key, step='ip', number_of_drones=number_of_drones, backend=assign_tours.IP_BACKEND, time_limit=BENCHMARK_IP_TIME_LIMIT,
+                            makespan=assign_tours.makespan(bins), bound=statistics.get('bound'), **_timing(record)))
+
+    # the whole sweep over the numbers of drones, as it is run by assign_tours.py
+    drone_counts = range(1, assign_tours.max_number_of_drones + 1)
+    for scheduler in ('heuristic', 'ip'):
+        first_record = len(profiling.records())
+        with profiling.stage('schedule_drone_counts', scheduler=scheduler, **key) as record:
+            schedules, report = assign_tours.schedule_drone_counts(jobs, drone_counts, scheduler, BENCHMARK_IP_TIME_LIMIT)
+        per_drone_count = [dict(number_of_drones=schedule['number_of_drones'], **_timing(schedule))
+                           for schedule in profiling.records()[first_record:] if schedule['stage'] == 'schedule']
+        # the makespans of all numbers of drones are summed, so a worse schedule for any of them shows in the comparison
+        results.append(dict(key, step='schedule_{}'.format(scheduler), **report, number_of_drone_counts=len(drone_counts),
+                            makespan=sum(assign_tours.makespan(bins) for _, _, bins in schedules),
+                            drone_counts=per_drone_count, **_timing(record)))
+
+    return results
+
+
+def run_benchmark(sizes=BENCHMARK_SIZES, densities=BENCHMARK_DENSITIES):
+    """
+    Runs benchmark_grid for every size and density and saves the results together with the environment
+    and the settings of the pipeline, so that they can be compared with later runs by compare_baselines.
+    :return: The path of the saved results
+    """
+    profiling.reset()
+    results = []
+    for cells in sizes:
+        for density, mean_population in densities.items():
+            results.extend(benchmark_grid(cells, density, mean_population))
+
+    import ortools
+    filename = './results/benchmark_{}.json'.format(time.strftime('%Y%m%d_%H%M%S'))
+    with open(filename, 'w') as f:
+        simplejson.dump({
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+                            'ortools': ortools.__version__, 'numpy': np.__version__},
+            'settings': {'drones_capacity': compute_tours.DRONES_CAPACITY, 'max_point_demand': compute_tours.MAX_POINT_DEMAND,
+                         'transit_mode': compute_tours.TRANSIT_MODE, 'split_delivery': compute_tours.SPLIT_DELIVERY,
+                         'decomposition_sectors': compute_tours.DECOMPOSITION_SECTORS, 'multilevel_ratio': compute_tours.MULTILEVEL_RATIO,
+                         'portfolio': compute_tours.PORTFOLIO,
+                         'scheduler': assign_tours.SCHEDULER, 'ip_backend': assign_tours.IP_BACKEND,
+                         'cvrp_time_limit': BENCHMARK_CVRP_TIME_LIMIT, 'cvrp_max_nodes': BENCHMARK_CVRP_MAX_NODES,
+                         'ip_time_limit': BENCHMARK_IP_TIME_LIMIT, 'seed': BENCHMARK_SEED},
+            'results': results,
+        }, f, indent=2)
+    print('Benchmark results saved to {}'.format(filename))
+    return filename
+
+
+def _result_key(result):
+    return result['step'], result['cells'], result['density'], result.get('number_of_drones')
+
+
+def compare_baselines(baseline_filename, filename, tolerance=BENCHMARK_TOLERANCE):
+    """
+    Compares two benchmark results offline: the wall time of every step, the objective of the CVRP and the makespans.
+    :param baseline_filename: Earlier results of run_benchmark
+    :param filename: New results of run_benchmark
+    :param tolerance: Relative slowdown or worse quality which is reported as a regression
+    :return: A list of regressions (strings)
+    """
+    with open(baseline_filename, 'r') as f:
+        baseline = simplejson.load(f)
+    with open(filename, 'r') as f:
+        current = simplejson.load(f)
+
+    for name in ('environment', 'settings'):
+        for key, value in current[name].items():
+            if baseline[name].get(key) != value:
+                print('Warning: {} "{}" differs: {} in the baseline, {} now'.format(name, key, baseline[name].get(key), value))
+
+    baseline_results = {_result_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = baseline_results.get(_result_key(result))
+        if old is None:
+            continue
+
+        name = '{} {} {}{}'.format(result['step'], result['cells'], result['density'],
+                                   ' {} drones'.format(result['number_of_drones']) if result.get('number_of_drones') else '')
+        if result.get('skipped') or old.get('skipped'):
+            print('{:<35} skipped: {}'.format(name, result.get('skipped') or 'in the baseline: {}'.format(old['skipped'])))
+            continue
+        line = '{:<35} {:>9.2f}s -> {:>9.2f}s'.format(name, old['wall_time'], result['wall_time'])
+        # the CVRP always runs for its time budget, so its speed is the time-to-quality
+        metrics = ['objective', 'makespan', 'ip_time'] + ['time_to_{}'.format(gap) for gap in BENCHMARK_QUALITY_GAPS]
+        if result['step'] != 'cvrp':
+            metrics.append('wall_time')
+
+        for metric in metrics:
+            if old.get(metric) is None or result.get(metric) is None:
+                continue
+            if metric != 'wall_time':
+                line += ', {} {:.1f} -> {:.1f}'.format(metric, old[metric], result[metric])
+            if result[metric] > old[metric] * (1 + tolerance) and result[metric] - old[metric] > 0.01:
+                regressions.append('{}: {} {:.2f} -> {:.2f}'.format(name, metric, old[metric], result[metric]))
+                line += ' REGRESSION'
+        print(line)
+
+    print('{} regressions'.format(len(regressions)))
+    return regressions
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'compare':
+        # python benchmark.py compare results/benchmark_baseline.json results/benchmark_new.json
+        sys.exit(1 if compare_baselines(sys.argv[2], sys.argv[3]) else 0)
+    else:
+        run_benchmark()
@@ -11,27 +11,64 @@
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import csv
 import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import simplejson
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
-from prepare_data import prepare_data
+from distances import is_sparse, project_points, sparse_graph
+from profiling import stage, write_report
+from prepare_data import prepare_data, subset_distance_matrix
+from warm_start import initial_routes
 
 
 DRONES_CAPACITY = 100 # Capacity of a single drone
 MAX_POINT_DEMAND = 20 # Maximum demand which a point can have. If a point has a higher demand, it will be splitted.
+SPLIT_DELIVERY = 'clones' # 'clones' splits a point into copies with at most MAX_POINT_DEMAND each, 'full_loads' first serves full drone loads by direct trips and splits only the rest (much fewer nodes in dense areas)
 STOP_TIME_MIN = 15 # Time serving a single node takes in minutes
 OPERATING_DAY_LENGTH_HOURS = 12 # Length of one operational day in hours.
 
 
 USE_CACHE = False # If set to True then distance matrix computation will be cached. Useful if many computations for the same geographical area will be made.
+SPARSE_NEIGHBOURS = None # If set to an integer k, only distances to the k nearest neighbours of every point and to the depot are computed. Use it for large regions where the dense distance matrix does not fit in memory.
+TRANSIT_MODE = 'matrix' # 'matrix' passes integer distances, demands and stop counters to the solver as data, 'callback' evaluates them with Python callbacks (slower, always used with SPARSE_NEIGHBOURS)
+TRANSIT_MATRIX_MAX_NODES = None # Above this many nodes the 'matrix' transit mode falls back to callbacks. None means it is derived from the available memory (see transit_matrix_max_nodes)
+TRANSIT_MATRIX_MEMORY_FRACTION = 0.5 # ... so that the transit matrix takes at most this part of the memory available when the model is built
+TRANSIT_MATRIX_BYTES_PER_ENTRY = 52 # Memory used per entry while the matrix is passed to the solver: the quantized array (8), the Python lists (8 + 28) and the copy of the solver (8)
+DISTANCE_SCALE = 1 # Distances are rounded to multiples of 1/DISTANCE_SCALE meters, as the solver works only with integers
 HEURISTIC_TIME_LIMIT = 4800 # How much time in seconds the solver will be trying to solve the CVRP. After this time the best solution found will be returned as the result.
 
+WARM_START = None # Path to earlier tours (e.g. './results/capacity_100_20.json') which are mapped to the current points, repaired and used as the initial solution
+WARM_START_TIME_LIMIT = 600 # Time limit in seconds used instead of HEURISTIC_TIME_LIMIT when the solver is warm-started
+
+DECOMPOSITION_SECTORS = None # If set to an integer, the points are divided into this many capacity-balanced sectors around the depot which are solved as independent CVRPs in parallel
+DECOMPOSITION_WORKERS = None # Number of processes solving the sectors. None means the number of CPUs
+BOUNDARY_REPAIR_ROUTES = 3 # How many routes from each side of a boundary between two sectors are re-solved together after merging the sectors
+BOUNDARY_REPAIR_TIME_LIMIT = 120 # Time limit in seconds of re-solving the routes along one boundary
+BOUNDARY_REPAIR_TIME_FRACTION = 0.1 # At most this part of the time limit of the decomposition is reserved for repairing the boundaries
+
+TRACE = True # If True, the objective, the number of drones used and the elapsed time of every solution found by the solver are written to results/capacity_{}_{}_trace.csv
+CHECKPOINT_INTERVAL = 300 # The best tours found so far are saved (in the normal results format) at most once per this many seconds during the search. None disables checkpoints
+
+MULTILEVEL_RATIO = None # If set (e.g. 0.25), neighbouring nodes are merged into approximately this many super-nodes per node, the smaller problem is solved and its tours are expanded and refined (see multilevel.py)
+
+PORTFOLIO = False # If True, several first solution strategies, metaheuristics and seeds (see portfolio.py) are run in parallel processes and the best solution is kept
+
 MAX_NUMBER_OF_STOPS = math.ceil((60/STOP_TIME_MIN)*OPERATING_DAY_LENGTH_HOURS) # The maximum number of stops a drone can make during a day
-NUM_VEHICLES = math.ceil(200000/DRONES_CAPACITY) # we solve the problem for more tours to ensure that there is enough capacity to cover all population
+FLEET_MARGIN = 0.1 # The solver gets this many more vehicles (relative to the lower bound from the total demand and the number of stops) than are surely needed
+FLEET_MIN_EXTRA_VEHICLES = 5 # ... but at least this many more vehicles
+FLEET_GROWTH = 1.5 # If no solution exists with the given number of vehicles, it is multiplied by this factor and the model is built again
+FLEET_MAX_ATTEMPTS = 4 # How many times the model is built (with more vehicles or a longer first solution limit) before giving up
+FIRST_SOLUTION_TIME_LIMIT = 600 # If no solution is found within this many seconds (or FIRST_SOLUTION_TIME_PER_NODE seconds per node if it is longer), the search is stopped and started again with the same vehicles and a twice longer limit (except in the last attempt). The limit is not used if it is not shorter than the time limit of the solver
+FIRST_SOLUTION_TIME_PER_NODE = 0.05 # The first solution heuristic needs about 110s for 6000 nodes, so the first solution limit grows with the size of the model
 
 
-def create_data_model(max_point_demand, use_cache=True):
+def create_data_model(max_point_demand, use_cache=True, neighbours=None, drones_capacity=DRONES_CAPACITY):
     """
     Creates data model which will be feeded into Google OR-tools solver.
 
@@ -39,84 +76,338 @@ def create_data_model(max_point_demand, use_cache=True):
     If a point has a higher demand, it will be splitted. Demand of a point must not exceed the capacity of a single drone!
     It is a Google OR-tools solver limitation.
     :param use_cache: If True then the computed distances matrix will be saved on the hard drive and reused later. Default: True
+    :param neighbours: If set to an integer k, a sparse k-nearest-neighbours graph is used instead of the dense distance matrix.
+    Arcs outside of the graph are penalized, so the solver avoids them. Default: None (dense matrix)
+    :param drones_capacity: Capacity of a single drone. Default: DRONES_CAPACITY
     :return: A data model.
     """
-    points_data = prepare_data(max_point_demand, use_cache=use_cache)
-    all_points = points_data['all_points']
-    distance_matrix = points_data['distance_matrix']
+    points_data = prepare_data(max_point_demand, use_cache=use_cache, neighbours=neighbours,
+                               full_load_capacity=drones_capacity if SPLIT_DELIVERY == 'full_loads' else None)
+    return build_data_model(points_data['all_points'], points_data['distance_matrix'], drones_capacity, points_data['full_loads'])
+
+
+def fleet_size(demands, counter, drones_capacity, max_number_of_stops, margin=None):
+    """
+    Computes how many vehicles the routing model gets. Every vehicle which is not used still adds variables to the model
+    and makes every move of the search more expensive, so the fleet is only slightly larger than the lower bound:
+    the total demand divided by the capacity of a drone, or the number of stops divided by the maximum number of stops.
+    One vehicle per served node is always enough, so the fleet is never larger than that.
+
+    :param demands: A list of demands of the nodes
+    :param counter: A list of the numbers of stops of the nodes
+    :param drones_capacity: Capacity of a single drone
+    :param max_number_of_stops: The maximum number of stops of a single drone
+    :param margin: The relative margin above the lower bound. Default: FLEET_MARGIN
+    :return: The number of vehicles
+    """
+    margin = FLEET_MARGIN if margin is None else margin
+    lower_bound = max(math.ceil(sum(demands) / drones_capacity), math.ceil(sum(counter) / max_number_of_stops))
+    number_of_vehicles = max(math.ceil(lower_bound * (1 + margin)), lower_bound + FLEET_MIN_EXTRA_VEHICLES)
+    return max(1, min(number_of_vehicles, sum(1 for demand in demands if demand > 0)))
+
+
+def resize_fleet(data, number_of_vehicles):
+    """Returns a copy of the data model with a different number of vehicles."""
+    data = dict(data)
+    data['vehicle_capacities'] = [data['vehicle_capacities'][0] for _ in range(number_of_vehicles)]
+    data['vehicle_max_number_of_stops'] = [data['vehicle_max_number_of_stops'][0] for _ in range(number_of_vehicles)]
+    data['num_vehicles'] = number_of_vehicles
+    return data
+
+
+def grow_fleet(data):
+    """Returns a copy of the data model with FLEET_GROWTH times more vehicles."""
+    number_of_vehicles = max(data['num_vehicles'] + 1, math.ceil(data['num_vehicles'] * FLEET_GROWTH))
+    print('No solution with {} vehicles, trying {}'.format(data['num_vehicles'], number_of_vehicles))
+    return resize_fleet(data, number_of_vehicles)
 
-    number_of_vehicles = max(math.ceil(len(all_points)/MAX_NUMBER_OF_STOPS) + 20, NUM_VEHICLES)
+
+def build_data_model(all_points, distance_matrix, drones_capacity=DRONES_CAPACITY, full_loads=None):
+    """
+    Creates data model from already split points and the distances between them.
+    :param all_points: Points where the first point is the depot
+    :param distance_matrix: A distance matrix (or a view of it) between the points
+    :param drones_capacity: Capacity of a single drone
+    :param full_loads: FullLoadTrips served outside of the routing problem (see prepare_data.split_full_loads). Default: None
+    :return: A data model.
+    """
+    demands = all_points.population.tolist()
+    counter = (all_points.population > 0).astype(int).tolist()
+    number_of_vehicles = fleet_size(demands, counter, drones_capacity, MAX_NUMBER_OF_STOPS)
     data = {
         'all_points': all_points,
         'distance_matrix': distance_matrix,
-        'demands': [x['Population'] for x in all_points],
-        'counter': [1 if x['Population'] > 0 else 0 for x in all_points],
-        'vehicle_capacities': [DRONES_CAPACITY for _ in range(number_of_vehicles)],
+        'demands': demands,
+        'counter': counter,
+        'vehicle_capacities': [drones_capacity for _ in range(number_of_vehicles)],
         'vehicle_max_number_of_stops': [MAX_NUMBER_OF_STOPS for _ in range(number_of_vehicles)],
         'num_vehicles': number_of_vehicles,
-        'depot': 0
+        'depot': 0,
+        'full_loads': full_loads
     }
 
-    print('Total demand = {}'.format(sum(data['demands'])))
+    full_load = full_loads.total_load if full_loads is not None else 0
+    print('Total demand = {}, number of vehicles = {}'.format(sum(data['demands']) + full_load, number_of_vehicles))
 
     return data
 
 
-def print_and_save_solution(data, manager, routing, assignment):
-    """Prints the solution to the console and saves it to a json file."""
-    total_distance = 0
-    total_load = 0
+def solution_filename(drones_capacity=DRONES_CAPACITY, max_point_demand=MAX_POINT_DEMAND):
+    return './results/capacity_{}_{}.json'.format(drones_capacity, max_point_demand)
+
+
+def arc_distance(data, from_node, to_node):
+    """Returns the distance between two nodes rounded in the same way as it is done for the solver."""
+    return int(round(data['distance_matrix'][from_node, to_node] * DISTANCE_SCALE))
+
+
+def routes_from_assignment(data, manager, routing, assignment=None):
+    """
+    Reads the tours from a solution of the solver.
+    :param assignment: The solution. None means the current values of the variables, which can be used in a solution callback.
+    :return: A list of non-empty routes, every route is a list of node indices starting at the depot.
+    """
     routes = []
     for vehicle_id in range(data['num_vehicles']):
         route = []
         index = routing.Start(vehicle_id)
+        while not routing.IsEnd(index):
+            route.append(manager.IndexToNode(index))
+            index = assignment.Value(routing.NextVar(index)) if assignment is not None else routing.NextVar(index).Value()
+        if len(route) > 1:
+            routes.append(route)
+    return routes
+
+
+def to_meters(distance):
+    """Converts a distance in the units of the solver (multiples of 1/DISTANCE_SCALE meters) back to meters."""
+    return distance / DISTANCE_SCALE if DISTANCE_SCALE != 1 else distance
+
+
+def arc_length(data, from_node, to_node):
+    """
+    Returns the real distance between two nodes in meters. Unlike arc_distance, the arcs which are not in a sparse
+    distance graph get their geodesic length instead of the penalty the solver sees.
+    """
+    graph, indices = sparse_graph(data['distance_matrix'])
+    if graph is None:
+        return float(data['distance_matrix'][from_node, to_node])
+    return graph.geodesic(indices[from_node], indices[to_node])
+
+
+def route_distance(data, route):
+    """
+    Computes the length of a route (a list of node indices starting at the depot) including the return to the depot in meters.
+    Every arc is rounded in the same way as it is done for the solver.
+    """
+    return to_meters(sum(int(round(arc_length(data, route[i], route[i + 1]) * DISTANCE_SCALE)) for i in range(len(route) - 1))
+                     + int(round(arc_length(data, route[-1], data['depot']) * DISTANCE_SCALE)))
+
+
+def full_load_routes(data):
+    """Returns the direct trips with a full drone (see prepare_data.split_full_loads) in the format of the saved routes."""
+    full_loads = data.get('full_loads')
+    if full_loads is None:
+        return []
+
+    depot = data['all_points'][data['depot']]
+    depot['load'] = 0
+    routes = []
+    for i in range(len(full_loads.trips)):
+        stop = full_loads.points[i]
+        stop['load'] = full_loads.capacity
+        distance = to_meters(int(round(full_loads.depot_distances[i] * DISTANCE_SCALE))
+                             + int(round(full_loads.return_distances[i] * DISTANCE_SCALE)))
+        for _ in range(full_loads.trips[i]):
+            routes.append({
+                'stops': [dict(depot), dict(stop)],
+                'distance': distance,
+                'load': full_loads.capacity,
+                'number_of_stops': 2
+            })
+    return routes
+
+
+def print_and_save_solution(data, routes, filename=None, verbose=True):
+    """
+    Prints the solution to the console and saves it to a json file.
+    :param data: The data model
+    :param routes: A list of routes, every route is a list of node indices starting at the depot
+    :param filename: Where to save the solution. Default: results/capacity_{DRONES_CAPACITY}_{MAX_POINT_DEMAND}.json
+    :param verbose: If False, the solution is only saved, not printed
+    """
+    total_distance = 0
+    total_load = 0
+    res_routes = []
+    for vehicle_id, nodes in enumerate(routes):
+        route = []
         plan_output = 'Route for vehicle {}:\n'.format(vehicle_id)
-        route_distance = 0
         route_load = 0
-        while not routing.IsEnd(index):
-            node_index = manager.IndexToNode(index)
+        for node_index in nodes:
             route_load += data['demands'][node_index]
             plan_output += ' {0} Load({1}) -> '.format(node_index, route_load)
-            previous_index = index
-            index = assignment.Value(routing.NextVar(index))
-            route_distance += routing.GetArcCostForVehicle(
-                previous_index, index, vehicle_id)
             point = data['all_points'][node_index]
             point['load'] = route_load
             route.append(point)
-        plan_output += ' {0} Load({1})\n'.format(manager.IndexToNode(index),
-                                                 route_load)
-        plan_output += 'Distance of the route: {}m\n'.format(route_distance)
+        distance = route_distance(data, nodes)
+        plan_output += ' {0} Load({1})\n'.format(data['depot'], route_load)
+        plan_output += 'Distance of the route: {}m\n'.format(distance)
         plan_output += 'Load of the route: {}\n'.format(route_load)
-        print(plan_output)
-        total_distance += route_distance
+        if verbose:
+            print(plan_output)
+        total_distance += distance
         total_load += route_load
         if route_load > 0:
-            routes.append({
+            res_routes.append({
                 'stops': route,
-                'distance': route_distance,
+                'distance': distance,
                 'load': route_load,
                 'number_of_stops': len(route)
             })
-    print('Total distance of all routes: {}m'.format(total_distance))
-    print('Total load of all routes: {}'.format(total_load))
-    with open('./results/capacity_{}_{}.json'.format(DRONES_CAPACITY, MAX_POINT_DEMAND), 'w') as f:
+
+    for route in full_load_routes(data):
+        total_distance += route['distance']
+        total_load += route['load']
+        res_routes.append(route)
+
+    total_distance = to_meters(int(round(total_distance * DISTANCE_SCALE))) # removes the floating point error of the sum
+    if verbose:
+        print('Total distance of all routes: {}m'.format(total_distance))
+        print('Total load of all routes: {}'.format(total_load))
+    with open(filename or solution_filename(), 'w') as f:
         simplejson.dump({
-            'routes': routes,
+            'routes': res_routes,
             'total_load': total_load,
             'total_distance': total_distance,
-            'number_of_drones_used': len(routes),
-            'total_numer_of_stops': sum([x['number_of_stops'] for x in routes])
+            'number_of_drones_used': len(res_routes),
+            'total_numer_of_stops': sum([x['number_of_stops'] for x in res_routes])
         }, f)
 
 
-def main():
-    """Solve the CVRP problem."""
+def quantize_distance_matrix(distance_matrix, scale=DISTANCE_SCALE, cost_noise=None):
+    """
+    Rounds the distances to integers (the solver works only with integer costs).
+    The matrix is quantized row by row into one preallocated array, so no full-size temporary arrays are created
+    and a lazy view of the distance matrix is never copied as a whole.
+    :param distance_matrix: A distance matrix in meters (a NumPy array or a view which returns its rows)
+    :param scale: Distances are rounded to multiples of 1/scale meters
+    :param cost_noise: If given, the rounded cost of the arc (i, j) is multiplied by 1 + (cost_noise[i] + cost_noise[j]) / 2
+    and rounded again (see build_routing_model). Default: None
+    :return: A NumPy array of integers
+    """
+    number_of_nodes = len(distance_matrix)
+    quantized = np.empty((number_of_nodes, number_of_nodes), dtype=np.int64)
+    row = np.empty(number_of_nodes, dtype=np.float64)
+    noise = np.asarray(cost_noise, dtype=np.float64) if cost_noise is not None else None
 
-    print('Drones capacity = {}'.format(DRONES_CAPACITY))
+    for i in range(number_of_nodes):
+        np.multiply(distance_matrix[i], scale, out=row)
+        np.rint(row, out=row)
+        if noise is not None:
+            np.multiply(row, 1 + (noise[i] + noise) / 2, out=row)
+            np.rint(row, out=row)
+        quantized[i] = row
 
-    # Instantiate the data of the problem
-    data = create_data_model(MAX_POINT_DEMAND, USE_CACHE)
+    return quantized
+
+
+def restrict_to_graph_arcs(data, manager, routing, extra_arcs=None):
+    """
+    Allows the solver to go from a node only to its neighbours in the sparse distance graph (and to the other copies
+    of the same point and to the depot), so the search never evaluates the arcs outside the graph.
+    :param extra_arcs: Pairs of nodes (from, to) which are allowed as well, e.g. the arcs of the routes of a warm start. Default: None
+    :return: The number of allowed arcs
+    """
+    graph, indices = sparse_graph(data['distance_matrix'])
+    depot = data['depot']
+    # the nodes of the model grouped by the point of the graph they refer to
+    order = np.argsort(indices, kind='stable')
+    sorted_indices = indices[order]
+    ends = [routing.End(vehicle_id) for vehicle_id in range(data['num_vehicles'])]
+    extra_successors = {}
+    for from_node, to_node in extra_arcs or ():
+        extra_successors.setdefault(from_node, set()).add(to_node)
+
+    allowed_arcs = 0
+    for node in range(len(indices)):
+        if node == depot:
+            continue
+        points = np.append(graph.neighbours(indices[node]), indices[node])
+        starts = np.searchsorted(sorted_indices, points, side='left')
+        stops = np.searchsorted(sorted_indices, points, side='right')
+        successors = {int(successor) for start, stop in zip(starts, stops)
+                      for successor in order[start:stop] if successor != node and successor != depot}
+        successors.update(successor for successor in extra_successors.get(node, ()) if successor != depot)
+        routing.NextVar(manager.NodeToIndex(node)).SetValues([manager.NodeToIndex(successor) for successor in successors] + ends)
+        allowed_arcs += len(successors) + 1
+    return allowed_arcs
+
+
+def available_memory():
+    """Returns the memory available for new allocations in bytes (MemAvailable on Linux), or None if it is not known."""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def transit_matrix_max_nodes():
+    """
+    Returns the largest number of nodes for which the 'matrix' transit mode is used: TRANSIT_MATRIX_MAX_NODES if it is set,
+    otherwise the number of nodes whose transit matrix takes TRANSIT_MATRIX_MEMORY_FRACTION of the available memory
+    (None if the available memory is not known).
+    """
+    if TRANSIT_MATRIX_MAX_NODES is not None:
+        return TRANSIT_MATRIX_MAX_NODES
+    memory = available_memory()
+    if memory is None:
+        return None
+    return int(math.sqrt(memory * TRANSIT_MATRIX_MEMORY_FRACTION / TRANSIT_MATRIX_BYTES_PER_ENTRY))
+
+
+def effective_transit_mode(data, transit_mode):
+    """
+    Returns the transit mode which is used for the data model: 'matrix' falls back to 'callback' when the distances are
+    given by a sparse graph or when the matrix would not fit in memory (see transit_matrix_max_nodes). The reason is printed.
+    """
+    if transit_mode != 'matrix':
+        return transit_mode
+    if is_sparse(data['distance_matrix']):
+        print('The distances are given by a sparse graph, falling back to Python callbacks')
+        return 'callback'
+    max_nodes = transit_matrix_max_nodes()
+    if max_nodes is not None and len(data['distance_matrix']) > max_nodes:
+        print('WARNING: the transit matrix of {} nodes would need {:.1f}GB, more than {} nodes fit in the memory limit '
+              '(TRANSIT_MATRIX_MAX_NODES, TRANSIT_MATRIX_MEMORY_FRACTION), falling back to Python callbacks'.format(
+                  len(data['distance_matrix']), len(data['distance_matrix'])**2 * TRANSIT_MATRIX_BYTES_PER_ENTRY / 2**30, max_nodes))
+        return 'callback'
+    return transit_mode
+
+
+def build_routing_model(data, transit_mode=TRANSIT_MODE, cost_noise=None, extra_arcs=None):
+    """
+    Creates the routing index manager and the routing model with the capacity and the number of stops constraints.
+
+    :param data: A data model created by create_data_model
+    :param transit_mode: "matrix" to quantize the distances once and pass the distance matrix, demands and stop counters
+    to the solver as data, so the solver never calls Python during the search, or "callback" to evaluate them with
+    Python callbacks (used when the distances are given by a sparse graph or when the matrix does not fit in memory,
+    see effective_transit_mode). Default: TRANSIT_MODE
+    :param cost_noise: If an array of a small non-negative number for every node is given, the cost of the arc (i, j)
+    is multiplied by 1 + (cost_noise[i] + cost_noise[j]) / 2, which makes the solver explore different solutions
+    (see portfolio.py). The objective of the solver then differs from the distance of the tours. Default: None
+    :param extra_arcs: Pairs of nodes which are allowed in addition to the arcs of a sparse graph (see restrict_to_graph_arcs),
+    e.g. the arcs of the routes of a warm start, so they can be read as a solution. Default: None
+    :return: The routing index manager and the routing model
+    """
+    transit_mode = effective_transit_mode(data, transit_mode)
 
     # Create the routing index manager
     manager = pywrapcp.RoutingIndexManager(len(data['distance_matrix']),
@@ -125,35 +416,47 @@ def main():
     # Create Routing Model
     routing = pywrapcp.RoutingModel(manager)
 
-    # Defining weights of the edges
-    def distance_callback(from_index, to_index):
-        """Returns the distance between the two nodes."""
-        # Convert from routing variable Index to distance matrix NodeIndex.
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return data['distance_matrix'][from_node][to_node]
-
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    if transit_mode == 'matrix':
+        distance_matrix = quantize_distance_matrix(data['distance_matrix'], cost_noise=cost_noise)
+        transit_callback_index = routing.RegisterTransitMatrix([row.tolist() for row in distance_matrix])
+        del distance_matrix
+        demand_callback_index = routing.RegisterUnaryTransitVector(data['demands'])
+        counter_callback_index = routing.RegisterUnaryTransitVector(data['counter'])
+    elif transit_mode == 'callback':
+        # Defining weights of the edges
+        def distance_callback(from_index, to_index):
+            """Returns the distance between the two nodes."""
+            # Convert from routing variable Index to distance matrix NodeIndex.
+            from_node = manager.IndexToNode(from_index)
+            to_node = manager.IndexToNode(to_index)
+            distance = int(round(data['distance_matrix'][from_node, to_node] * DISTANCE_SCALE))
+            if cost_noise is not None:
+                distance = int(round(distance * (1 + (cost_noise[from_node] + cost_noise[to_node]) / 2)))
+            return distance
+
+        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+
+        # Addding capacity constraints.
+        def demand_callback(from_index):
+            """Returns the demand for tests of the node."""
+            from_node = manager.IndexToNode(from_index)
+            return data['demands'][from_node]
+
+        demand_callback_index = routing.RegisterUnaryTransitCallback(
+            demand_callback)
+
+        def counter_callback(from_index):
+            """Returns the number of stops done at the node."""
+            from_node = manager.IndexToNode(from_index)
+            return data['counter'][from_node]
+
+        counter_callback_index = routing.RegisterUnaryTransitCallback(
+            counter_callback)
+    else:
+        raise ValueError('Unknown transit mode "{}"'.format(transit_mode))
 
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
-    # Addding capacity constraints.
-    def demand_callback(from_index):
-        """Returns the demand for tests of the node."""
-        from_node = manager.IndexToNode(from_index)
-        return data['demands'][from_node]
-
-    demand_callback_index = routing.RegisterUnaryTransitCallback(
-        demand_callback)
-
-    def counter_callback(from_index):
-        """Returns the number of stops done at the node."""
-        from_node = manager.IndexToNode(from_index)
-        return data['counter'][from_node]
-
-    counter_callback_index = routing.RegisterUnaryTransitCallback(
-        counter_callback)
-
     # Limiting the number of tests each drone can carry
     routing.AddDimensionWithVehicleCapacity(
         demand_callback_index,
@@ -170,21 +473,526 @@ def main():
         True,  # start cumul to zero
         'Counter')
 
-    # Setting parameters of the solver
+    if is_sparse(data['distance_matrix']):
+        allowed_arcs = restrict_to_graph_arcs(data, manager, routing, extra_arcs)
+        print('The solver may use {} arcs of the sparse graph ({:.1f} per node)'.format(allowed_arcs, allowed_arcs / max(1, len(data['demands']) - 1)))
+
+    return manager, routing
+
+
+def close_routing_model(data, routing, search_parameters, build_start):
+    """Closes the routing model (which otherwise happens when the search starts) and prints its size and how long it took to build it."""
+    routing.CloseModelWithParameters(search_parameters)
+    print('Routing model: {} nodes, {} vehicles, {} variables, built in {:.2f}s, {:.0f}MB used'.format(
+        len(data['demands']), data['num_vehicles'], routing.Size(), time.time() - build_start,
+        pywrapcp.Solver.MemoryUsage() / 2**20))
+
+
+def add_first_solution_limit(routing, time_limit=FIRST_SOLUTION_TIME_LIMIT):
+    """
+    Stops the search if it does not find any solution within time_limit seconds, so a first solution heuristic which is stuck
+    does not use the whole time limit of the solver. The search is then started again with a longer limit (see next_attempt).
+    Has to be called before the model is closed.
+    :return: A function telling whether the search was stopped by this limit
+    """
+    state = {'solutions': 0, 'start': None, 'stopped': False}
+
+    def at_solution():
+        state['solutions'] += 1
+
+    def check():
+        if state['solutions'] > 0:
+            return False
+        if state['start'] is None:
+            state['start'] = time.time()
+        state['stopped'] = time.time() - state['start'] > time_limit
+        return state['stopped']
+
+    routing.AddAtSolutionCallback(at_solution)
+    routing.AddSearchMonitor(routing.solver().CustomLimit(check))
+    return lambda: state['stopped']
+
+
+def first_solution_time_limit(number_of_nodes, time_limit, retries=0):
+    """
+    Returns the first solution limit: FIRST_SOLUTION_TIME_LIMIT or FIRST_SOLUTION_TIME_PER_NODE seconds per node if it is longer,
+    doubled for every earlier attempt which reached it. Returns None if the limit is not shorter than the time limit of the solver.
+    """
+    limit = max(FIRST_SOLUTION_TIME_LIMIT, FIRST_SOLUTION_TIME_PER_NODE * number_of_nodes) * 2 ** retries
+    return limit if limit < time_limit else None
+
+
+def fleet_is_too_small(routing):
+    """
+    Checks whether the search failed in a way which more vehicles may fix. Running out of time (also the first solution limit)
+    does not count, as it happens also with enough vehicles when the model is large, and more vehicles only make the model larger.
+    """
+    return routing.status() in (routing_enums_pb2.RoutingSearchStatus.ROUTING_FAIL,
+                                routing_enums_pb2.RoutingSearchStatus.ROUTING_INFEASIBLE)
+
+
+def next_attempt(data, too_small, stopped_without_solution, retries):
+    """
+    Decides how to continue after an attempt which found no solution: with more vehicles if the fleet is too small,
+    with the same vehicles and a longer first solution limit if that limit was reached, or not at all.
+    :param data: The data model of the attempt
+    :param too_small: Whether the fleet is too small (see fleet_is_too_small)
+    :param stopped_without_solution: Whether the search was stopped by the first solution limit
+    :param retries: The number of earlier attempts which reached the first solution limit
+    :return: The data model and the number of retries for the next attempt, or None if another attempt would not help
+    """
+    if too_small:
+        return grow_fleet(data), retries
+    if stopped_without_solution:
+        print('No first solution with {} vehicles within the first solution limit, trying again with a longer limit'.format(data['num_vehicles']))
+        return data, retries + 1
+    return None
+
+
+def create_search_parameters(time_limit=HEURISTIC_TIME_LIMIT, log_search=True):
+    """Creates the parameters of the solver."""
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
     search_parameters.first_solution_strategy = (
         routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC)
     search_parameters.local_search_metaheuristic = (
         routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-    search_parameters.time_limit.seconds = HEURISTIC_TIME_LIMIT
-    search_parameters.log_search = True
+    search_parameters.time_limit.seconds = int(time_limit)
+    search_parameters.log_search = log_search
+
+    return search_parameters
+
+
+def search_statistics(routing, elapsed):
+    """
+    Collects the throughput of the search, which allows to compare the transit modes.
+    :param routing: The routing model after the search
+    :param elapsed: Wall time of the search in seconds
+    :return: A dictionary with the statistics
+    """
+    solver = routing.solver()
+    elapsed = max(elapsed, 1e-9)
+    return {
+        'wall_time': elapsed,
+        'branches': solver.Branches(),
+        'failures': solver.Failures(),
+        'solutions': solver.Solutions(),
+        'accepted_neighbors': solver.AcceptedNeighbors(),
+        'branches_per_second': solver.Branches() / elapsed,
+        'accepted_neighbors_per_second': solver.AcceptedNeighbors() / elapsed,
+    }
+
+
+class SolutionRecorder:
+    """
+    A solution callback of the routing model. For every solution found by the solver it writes a row with the attempt
+    and the number of vehicles of the model (see next_attempt), the elapsed time of the attempt, the objective, the best objective
+    so far and the number of drones used to a CSV trace. The first attempt starts the trace, later attempts append to it. The tours of the best solution
+    are kept and saved to the results file right away for the first solution and then at most once per checkpoint_interval
+    seconds (on any later solution), so a run which is stopped early still leaves its best tours.
+    """
+    def __init__(self, data, manager, routing, trace_filename=None, checkpoint_filename=None, checkpoint_interval=CHECKPOINT_INTERVAL, attempt=0):
+        self.data = data
+        self.manager = manager
+        self.routing = routing
+        self.checkpoint_filename = checkpoint_filename
+        self.checkpoint_interval = checkpoint_interval
+        self.attempt = attempt
+        self.start = time.time()
+        self.last_checkpoint = None
+        self.best_objective = None
+        self.best_routes = None
+        self.best_saved = False
+        self.number_of_solutions = 0
+        self.number_of_checkpoints = 0
+
+        self._trace_file = None
+        if trace_filename is not None:
+            self._trace_file = open(trace_filename, 'w' if attempt == 0 else 'a', newline='')
+            self._trace = csv.writer(self._trace_file)
+            if attempt == 0:
+                self._trace.writerow(['attempt', 'num_vehicles', 'elapsed', 'objective', 'best_objective', 'vehicles_used'])
+
+    def vehicles_used(self):
+        return sum(1 for vehicle_id in range(self.data['num_vehicles'])
+                   if not self.routing.IsEnd(self.routing.NextVar(self.routing.Start(vehicle_id)).Value()))
+
+    def __call__(self):
+        elapsed = time.time() - self.start
+        objective = self.routing.CostVar().Value()
+        self.number_of_solutions += 1
+        if self.best_objective is None or objective < self.best_objective:
+            self.best_objective = objective
+            if self.checkpoint_filename is not None and self.checkpoint_interval is not None:
+                self.best_routes = routes_from_assignment(self.data, self.manager, self.routing)
+                self.best_saved = False
+
+        if self._trace_file is not None:
+            self._trace.writerow([self.attempt, self.data['num_vehicles'], round(elapsed, 3), objective, self.best_objective, self.vehicles_used()])
+            self._trace_file.flush()
+
+        if (self.best_routes is not None and not self.best_saved
+                and (self.last_checkpoint is None or time.time() - self.last_checkpoint >= self.checkpoint_interval)):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Saves the best solution, the file is replaced only when it is completely written."""
+        tmp_filename = self.checkpoint_filename + '.tmp'
+        print_and_save_solution(self.data, self.best_routes, tmp_filename, verbose=False)
+        os.replace(tmp_filename, self.checkpoint_filename)
+        self.last_checkpoint = time.time()
+        self.best_saved = True
+        self.number_of_checkpoints += 1
+        print('Checkpoint after {:.0f}s: objective {}'.format(self.last_checkpoint - self.start, self.best_objective))
+
+    def close(self):
+        if self._trace_file is not None:
+            self._trace_file.close()
+            self._trace_file = None
+
+
+def solve_data_model(data, time_limit=HEURISTIC_TIME_LIMIT, transit_mode=TRANSIT_MODE, log_search=True):
+    """
+    Builds the routing model for the data model and solves it.
+    :return: A list of routes (lists of node indices starting at the depot) or None if no solution was found.
+    """
+    if is_sparse(data['distance_matrix']):
+        transit_mode = 'callback'
+
+    retries = 0
+    for attempt in range(FLEET_MAX_ATTEMPTS):
+        build_start = time.time()
+        manager, routing = build_routing_model(data, transit_mode)
+        search_parameters = create_search_parameters(time_limit, log_search)
+        limit = first_solution_time_limit(len(data['demands']), time_limit, retries) if attempt < FLEET_MAX_ATTEMPTS - 1 else None
+        stopped_without_solution = add_first_solution_limit(routing, limit) if limit is not None else lambda: False
+        close_routing_model(data, routing, search_parameters, build_start)
+        assignment = routing.SolveWithParameters(search_parameters)
+        if assignment:
+            break
+        retry = next_attempt(data, fleet_is_too_small(routing), stopped_without_solution(), retries)
+        if retry is None:
+            break
+        data, retries = retry
+
+    if not assignment:
+        return None
+
+    return routes_from_assignment(data, manager, routing, assignment)
+
+
+def sub_data_model(data, nodes):
+    """
+    Creates a data model of the CVRP restricted to the depot and the given nodes.
+    The indices of the nodes in the original data model are kept in "nodes".
+    """
+    indices = np.concatenate(([data['depot']], np.asarray(nodes, dtype=np.int64)))
+    distance_matrix = subset_distance_matrix(data['distance_matrix'], indices)
+    if not is_sparse(distance_matrix):
+        # the matrix of a sub-problem is small, so it is cheaper to copy it than to send the whole base matrix to a worker
+        distance_matrix = np.asarray(distance_matrix)
+
+    demands = [data['demands'][i] for i in indices]
+    counter = [data['counter'][i] for i in indices]
+    drones_capacity = data['vehicle_capacities'][0]
+    max_number_of_stops = data['vehicle_max_number_of_stops'][0]
+    number_of_vehicles = fleet_size(demands, counter, drones_capacity, max_number_of_stops)
+
+    return {
+        'all_points': data['all_points'].take(indices),
+        'distance_matrix': distance_matrix,
+        'demands': demands,
+        'counter': counter,
+        'vehicle_capacities': [drones_capacity for _ in range(number_of_vehicles)],
+        'vehicle_max_number_of_stops': [max_number_of_stops for _ in range(number_of_vehicles)],
+        'num_vehicles': number_of_vehicles,
+        'depot': 0,
+        'nodes': indices
+    }
 
 
-    print('START SOLVING')
-    assignment = routing.SolveWithParameters(search_parameters)
+def _solve_sub_problem(args):
+    """Solves a sub-problem in a worker process and returns its routes in terms of the nodes of the original data model."""
+    sub_data, time_limit = args
+    routes = solve_data_model(sub_data, time_limit, log_search=False)
+    if routes is None:
+        return None
+    return [[int(sub_data['nodes'][node]) for node in route] for route in routes]
+
+
+def sweep_sectors(data, number_of_sectors):
+    """
+    Divides the served nodes into sectors around the depot by sweeping a ray around it.
+    The boundary k is placed where the cumulative demand reaches k/number_of_sectors of the total demand, rounded to
+    a whole number of drone loads, so the rounding errors do not pile up in the last sector.
+    The sweep starts at the largest angular gap between the nodes, so the boundaries do not cut through dense areas
+    more than necessary.
+
+    :param data: The data model
+    :param number_of_sectors: Into how many sectors to divide the nodes
+    :return: A list of arrays of node indices (in the order of the sweep)
+    """
+    points = data['all_points']
+    depot = data['depot']
+    drones_capacity = data['vehicle_capacities'][0]
+    nodes = np.flatnonzero(np.asarray(data['demands']) > 0)
+
+    coordinates = project_points(points.lat[nodes], points.lon[nodes], points.lat[depot], points.lon[depot])
+    angles = np.arctan2(coordinates[:, 1], coordinates[:, 0])
+    order = np.argsort(angles, kind='stable')
+    gaps = np.diff(np.concatenate((angles[order], [angles[order[0]] + 2 * np.pi])))
+    order = np.roll(order, -((np.argmax(gaps) + 1) % len(order)))
+    nodes = nodes[order]
+
+    cumulative_demand = np.cumsum(np.asarray(data['demands'])[nodes])
+    loads = cumulative_demand[-1] / number_of_sectors / drones_capacity
+    boundaries = np.array([round(k * loads) * drones_capacity for k in range(1, number_of_sectors)])
+    sector_ids = np.searchsorted(boundaries, cumulative_demand, side='left')
+
+    return [nodes[sector_ids == sector] for sector in range(number_of_sectors) if (sector_ids == sector).any()]
+
+
+def repair_boundaries(data, sectors, sector_routes, executor, time_limit=BOUNDARY_REPAIR_TIME_LIMIT):
+    """
+    Re-solves together the routes lying next to every boundary between two neighbouring sectors and keeps the new routes
+    if they are shorter. Boundaries which do not share a sector are repaired in parallel.
+
+    :param data: The data model
+    :param sectors: Sectors as returned by sweep_sectors
+    :param sector_routes: A list of routes of every sector
+    :param executor: A process pool
+    :param time_limit: Time limit of solving one boundary in seconds
+    :return: The repaired list of routes of every sector
+    """
+    position = np.full(len(data['demands']), -1.0)
+    sweep = np.concatenate(sectors)
+    position[sweep] = np.arange(len(sweep))
+    sector_routes = [list(routes) for routes in sector_routes]
+
+    for parity in (0, 1):
+        tasks = []
+        for left in range(parity, len(sectors) - 1, 2):
+            boundary = position[sectors[left + 1][0]]
+
+            def distance_to_boundary(route):
+                return abs(np.mean(position[route[1:]]) - boundary)
+
+            old_routes = (sorted(sector_routes[left], key=distance_to_boundary)[:BOUNDARY_REPAIR_ROUTES]
+                          + sorted(sector_routes[left + 1], key=distance_to_boundary)[:BOUNDARY_REPAIR_ROUTES])
+            nodes = [node for route in old_routes for node in route[1:]]
+            tasks.append((left, boundary, old_routes, sub_data_model(data, nodes)))
+
+        results = executor.map(_solve_sub_problem, [(task[3], time_limit) for task in tasks])
+
+        for (left, boundary, old_routes, _), new_routes in zip(tasks, results):
+            old_distance = sum(route_distance(data, route) for route in old_routes)
+            if new_routes is None or sum(route_distance(data, route) for route in new_routes) >= old_distance:
+                continue
+
+            replaced = set(map(id, old_routes))
+            for sector in (left, left + 1):
+                sector_routes[sector] = [route for route in sector_routes[sector] if id(route) not in replaced]
+            for route in new_routes:
+                sector_routes[left if np.mean(position[route[1:]]) < boundary else left + 1].append(route)
+
+            print('Boundary between sectors {} and {}: {}m -> {}m'.format(
+                left, left + 1, old_distance, sum(route_distance(data, route) for route in new_routes)))
+
+    return sector_routes
+
+
+def solve_by_sectors(data, number_of_sectors, time_limit=HEURISTIC_TIME_LIMIT, workers=DECOMPOSITION_WORKERS):
+    """
+    Cluster-first route-second decomposition: divides the served nodes into capacity-balanced sectors around the depot,
+    solves every sector as an independent CVRP in a process pool, merges the routes and repairs the boundaries between
+    neighbouring sectors.
+
+    :param data: The data model
+    :param number_of_sectors: Into how many sectors to divide the nodes
+    :param time_limit: Total time budget in seconds. At most BOUNDARY_REPAIR_TIME_FRACTION of it is reserved for repairing
+    the boundaries (which is skipped if it leaves less than a second per boundary), the rest is divided between the sectors
+    according to the number of workers.
+    :param workers: Number of worker processes. None means the number of CPUs.
+    :return: A list of routes (lists of node indices starting at the depot) or None if some sector was not solved.
+    """
+    sectors = sweep_sectors(data, number_of_sectors)
+    workers = min(workers or os.cpu_count() or 1, len(sectors))
+    # the boundaries are repaired in two rounds (every other boundary at a time), each in waves of at most "workers" solves
+    boundaries = len(sectors) - 1
+    repair_waves = math.ceil((boundaries + 1) // 2 / workers) + math.ceil(boundaries // 2 / workers)
+    repair_time_limit = int(min(BOUNDARY_REPAIR_TIME_LIMIT, BOUNDARY_REPAIR_TIME_FRACTION * time_limit / max(1, repair_waves)))
+    if repair_time_limit < 1:
+        repair_waves = 0
+    sector_time_limit = max(1, int((time_limit - repair_time_limit * repair_waves) * workers // len(sectors)))
+    print('Solving {} sectors with {} workers, {}s per sector, {} waves of {}s repairing the boundaries, sector sizes: {}'.format(
+        len(sectors), workers, sector_time_limit, repair_waves, repair_time_limit, [len(nodes) for nodes in sectors]))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        sector_routes = list(executor.map(_solve_sub_problem, [(sub_data_model(data, nodes), sector_time_limit) for nodes in sectors]))
+
+        if any(routes is None for routes in sector_routes):
+            print('No solution was found for some of the sectors')
+            return None
+
+        print('Total distance before repairing boundaries: {}m'.format(
+            sum(route_distance(data, route) for routes in sector_routes for route in routes)))
+        if repair_waves > 0:
+            sector_routes = repair_boundaries(data, sectors, sector_routes, executor, repair_time_limit)
+
+    return [route for routes in sector_routes for route in routes]
+
+
+def read_initial_assignment(data, routing, routes):
+    """
+    Turns routes (lists of node indices without the depot) into an assignment which can seed the solver.
+    The routing model has to be closed already (see close_routing_model).
+    :return: The assignment or None if the routes are not a feasible solution of the model
+    """
+    if len(routes) > data['num_vehicles']:
+        print('The warm start has more routes than vehicles, it is ignored')
+        return None
+
+    initial_assignment = routing.ReadAssignmentFromRoutes(routes, True)
+    if initial_assignment is None:
+        print('The warm start is not a feasible solution, it is ignored')
+    return initial_assignment
+
+
+def solve_and_save(data, filename=None, time_limit=HEURISTIC_TIME_LIMIT, warm_start=None):
+    """
+    Solves the CVRP for the data model and saves the tours.
+    :param data: The data model
+    :param filename: Where to save the solution. Default: results/capacity_{DRONES_CAPACITY}_{MAX_POINT_DEMAND}.json
+    :param time_limit: Time limit of the solver in seconds
+    :param warm_start: Path to earlier tours (in the format of the results) used as the initial solution. Default: None
+    :return: The list of routes or None if no solution was found
+    """
+    if DECOMPOSITION_SECTORS:
+        if warm_start:
+            print('Warm start is not supported together with decomposition, it is ignored')
+        print('START SOLVING')
+        with stage('solve', mode='sectors'):
+            routes = solve_by_sectors(data, DECOMPOSITION_SECTORS, time_limit, DECOMPOSITION_WORKERS)
+        if routes is not None:
+            with stage('save'):
+                print_and_save_solution(data, routes, filename)
+        return routes
+
+    if MULTILEVEL_RATIO:
+        from multilevel import solve_multilevel
+        if warm_start:
+            print('Warm start is not supported together with the multilevel mode, it is ignored')
+        print('START SOLVING')
+        with stage('solve', mode='multilevel'):
+            routes = solve_multilevel(data, MULTILEVEL_RATIO, time_limit)
+        if routes is not None:
+            with stage('save'):
+                print_and_save_solution(data, routes, filename)
+        return routes
+
+    if PORTFOLIO:
+        from portfolio import solve_portfolio
+        if warm_start:
+            print('Warm start is not supported together with the portfolio, it is ignored')
+        print('START SOLVING')
+        filename = filename or solution_filename()
+        retries = 0
+        for attempt in range(FLEET_MAX_ATTEMPTS):
+            statistics = {}
+            with stage('solve', mode='portfolio', number_of_vehicles=data['num_vehicles']):
+                routes = solve_portfolio(data, time_limit, report_filename=filename.replace('.json', '_portfolio.json'),
+                                         first_solution_retries=retries if attempt < FLEET_MAX_ATTEMPTS - 1 else None,
+                                         statistics=statistics)
+            if routes is not None:
+                break
+            retry = next_attempt(data, statistics['fleet_is_too_small'], statistics['stopped_without_solution'], retries)
+            if retry is None:
+                break
+            data, retries = retry
+        if routes is not None:
+            with stage('save'):
+                print_and_save_solution(data, routes, filename)
+        return routes
+
+    transit_mode = effective_transit_mode(data, TRANSIT_MODE)
+    filename = filename or solution_filename()
+
+    warm_start_routes = None
+    warm_start_arcs = None
+    if warm_start:
+        warm_start_routes = initial_routes(warm_start, data)
+        if len(warm_start_routes) > data['num_vehicles']:
+            data = resize_fleet(data, len(warm_start_routes) + FLEET_MIN_EXTRA_VEHICLES)
+        # the earlier tours may use arcs which are not in the sparse graph, they are allowed as well so the tours can be read
+        warm_start_arcs = [(route[i], route[i + 1]) for route in warm_start_routes for i in range(len(route) - 1)]
+
+    retries = 0
+    for attempt in range(FLEET_MAX_ATTEMPTS):
+        with stage('model_build', number_of_vehicles=data['num_vehicles']):
+            build_start = time.time()
+            manager, routing = build_routing_model(data, transit_mode, extra_arcs=warm_start_arcs)
+
+            # Setting parameters of the solver
+            search_parameters = create_search_parameters(time_limit)
+
+            recorder = SolutionRecorder(data, manager, routing, filename.replace('.json', '_trace.csv') if TRACE else None,
+                                        filename, CHECKPOINT_INTERVAL, attempt)
+            # the callbacks are added before the model is closed
+            routing.AddAtSolutionCallback(recorder)
+            limit = first_solution_time_limit(len(data['demands']), time_limit, retries) if attempt < FLEET_MAX_ATTEMPTS - 1 else None
+            stopped_without_solution = add_first_solution_limit(routing, limit) if limit is not None else lambda: False
+            close_routing_model(data, routing, search_parameters, build_start)
+
+            initial_assignment = None
+            if warm_start_routes is not None:
+                initial_assignment = read_initial_assignment(data, routing, warm_start_routes)
+
+        print('START SOLVING')
+        start = time.time()
+        try:
+            with stage('solve', mode=transit_mode, number_of_vehicles=data['num_vehicles']):
+                if initial_assignment is not None:
+                    assignment = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+                else:
+                    assignment = routing.SolveWithParameters(search_parameters)
+        finally:
+            recorder.close()
+
+        statistics = search_statistics(routing, time.time() - start)
+        print('Search throughput ({}): {:.0f} branches/s, {:.0f} accepted neighbors/s, {} solutions in {:.1f}s'.format(
+            transit_mode, statistics['branches_per_second'], statistics['accepted_neighbors_per_second'],
+            statistics['solutions'], statistics['wall_time']))
+
+        if assignment:
+            break
+        retry = next_attempt(data, fleet_is_too_small(routing), stopped_without_solution(), retries)
+        if retry is None:
+            break
+        data, retries = retry
+
+    if not assignment:
+        return None
+
+    routes = routes_from_assignment(data, manager, routing, assignment)
+    with stage('save'):
+        print_and_save_solution(data, routes, filename)
+    return routes
+
+
+def main():
+    """Solve the CVRP problem."""
+
+    print('Drones capacity = {}'.format(DRONES_CAPACITY))
+
+    # Instantiate the data of the problem
+    data = create_data_model(MAX_POINT_DEMAND, USE_CACHE, SPARSE_NEIGHBOURS)
+
+    if WARM_START:
+        solve_and_save(data, solution_filename(DRONES_CAPACITY, MAX_POINT_DEMAND), WARM_START_TIME_LIMIT, WARM_START)
+    else:
+        solve_and_save(data, solution_filename(DRONES_CAPACITY, MAX_POINT_DEMAND), HEURISTIC_TIME_LIMIT)
 
-    if assignment:
-        print_and_save_solution(data, manager, routing, assignment)
+    write_report(solution_filename(DRONES_CAPACITY, MAX_POINT_DEMAND).replace('.json', '_profile.json'),
+                 drones_capacity=DRONES_CAPACITY, max_point_demand=MAX_POINT_DEMAND)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import hashlib
+import os
+
+import numpy as np
+
+
+CACHE_DIRECTORY = 'results/cache' # Directory where the cached distance matrices are stored
+CACHE_MAX_BYTES = 8 * 2**30 # Total size of the cache after which the least recently used matrices are removed
+CACHE_DTYPE = np.float64 # Type of the cached matrix entries. np.float32 halves the size of the cache (with ~1mm precision for distances up to 30km)
+
+
+def cache_key(lats, lons, depot, method, dtype=CACHE_DTYPE):
+    """
+    Computes a key identifying a distance matrix. The key changes whenever coordinates of any point (including which
+    points are kept by the filter), the depot, the distance method or the type of the entries change.
+
+    :param lats: An array of latitudes
+    :param lons: An array of longitudes
+    :param depot: The depot point (a dictionary with "lat" and "lon")
+    :param method: The name of the method used for computing distances
+    :param dtype: Type of the matrix entries
+    :return: A hexadecimal string
+    """
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(lats, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(lons, dtype=np.float64).tobytes())
+    h.update(np.array([depot['lat'], depot['lon']], dtype=np.float64).tobytes())
+    h.update('{}|{}'.format(method, np.dtype(dtype).str).encode())
+    return h.hexdigest()[:32]
+
+
+def cache_path(key, directory=CACHE_DIRECTORY):
+    return os.path.join(directory, 'distance_matrix_{}.npy'.format(key))
+
+
+def evict(directory=CACHE_DIRECTORY, max_bytes=CACHE_MAX_BYTES, keep=()):
+    """
+    Removes the least recently used matrices until the total size of the cache does not exceed max_bytes.
+    :param directory: The cache directory
+    :param max_bytes: Maximum total size of the cache in bytes
+    :param keep: Paths which must not be removed (e.g., the matrix which is currently in use)
+    :return: A list of removed paths
+    """
+    entries = []
+    for name in os.listdir(directory):
+        if name.startswith('distance_matrix_') and name.endswith('.npy'):
+            filename = os.path.join(directory, name)
+            stat = os.stat(filename)
+            entries.append((stat.st_mtime, stat.st_size, filename))
+
+    total = sum(size for _, size, _ in entries)
+    removed = []
+
+    for _, size, filename in sorted(entries):
+        if total <= max_bytes:
+            break
+        if filename in keep:
+            continue
+        os.remove(filename)
+        removed.append(filename)
+        total -= size
+
+    return removed
+
+
+def load_or_compute(lats, lons, depot, method, compute, directory=CACHE_DIRECTORY, dtype=CACHE_DTYPE, max_bytes=CACHE_MAX_BYTES):
+    """
+    Returns a read-only memory-mapped distance matrix from the cache, computing and storing it first if it is missing.
+    Several processes opening the same matrix share its pages, so opening it is nearly instant and does not copy it.
+
+    :param lats: An array of latitudes
+    :param lons: An array of longitudes
+    :param depot: The depot point (a dictionary with "lat" and "lon")
+    :param method: The name of the method used for computing distances (part of the key)
+    :param compute: A function taking a preallocated square matrix and filling it with distances
+    :param directory: The cache directory
+    :param dtype: Type of the matrix entries
+    :param max_bytes: Maximum total size of the cache in bytes
+    :return: A np.memmap with the distance matrix
+    """
+    os.makedirs(directory, exist_ok=True)
+    filename = cache_path(cache_key(lats, lons, depot, method, dtype), directory)
+
+    if os.path.exists(filename):
+        os.utime(filename) # the modification time is used for the least recently used eviction
+    else:
+        # The matrix is written to a temporary file which is renamed when it is complete,
+        # so an interrupted computation never leaves a broken matrix in the cache.
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        n = len(lats)
+        matrix = np.lib.format.open_memmap(tmp_filename, mode='w+', dtype=dtype, shape=(n, n))
+        try:
+            compute(matrix)
+            matrix.flush()
+            del matrix
+            os.replace(tmp_filename, filename)
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+        evict(directory, max_bytes, keep=(filename,))
+
+    return np.load(filename, mmap_mode='r')
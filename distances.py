@@ -0,0 +1,356 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from geopy.distance import distance
+import numpy as np
+
+
+WGS84_A = 6378137.0 # Semi-major axis of the WGS-84 ellipsoid in meters (the same ellipsoid geopy uses by default)
+WGS84_F = 1 / 298.257223563 # Flattening of the WGS-84 ellipsoid
+WGS84_B = (1 - WGS84_F) * WGS84_A
+
+VINCENTY_MAX_ITERATIONS = 200 # Maximum number of iterations of Vincenty's inverse formula
+VINCENTY_CONVERGENCE = 1e-12 # Convergence threshold (in radians) of Vincenty's inverse formula
+
+DISTANCE_TOLERANCE_M = 0.01 # Maximum allowed difference in meters between the vectorized engine and geopy
+BLOCK_ELEMENTS = 2**20 # Approximate number of matrix entries computed by one block (bounds the memory used by one worker)
+SPARSE_MISSING_ARC_FACTOR = 10 # In the sparse graph, the planar distance of pairs which are not neighbours is multiplied by this factor
+
+
+def vincenty_inverse(lat1, lon1, lat2, lon2):
+    """
+    Computes geodesic distances on the WGS-84 ellipsoid with Vincenty's inverse formula for whole arrays at once.
+    The arrays are broadcast against each other, so a column of points against a row of points gives a block of the matrix.
+
+    For points which are not (nearly) antipodal the result agrees with geopy.distance.distance (Karney's algorithm)
+    to a fraction of a millimeter. The pairs where the iteration did not converge are reported back to the caller.
+
+    :param lat1: Latitudes of the first points in degrees
+    :param lon1: Longitudes of the first points in degrees
+    :param lat2: Latitudes of the second points in degrees
+    :param lon2: Longitudes of the second points in degrees
+    :return: An array of distances in meters and a boolean array marking the pairs where the iteration did not converge.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2)])
+
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    big_l = np.radians(lon2 - lon1)
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = big_l.copy()
+    not_converged = np.ones(lam.shape, dtype=bool)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(VINCENTY_MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma > 0, cos_u1 * cos_u2 * sin_lam / sin_sigma, 0.0)
+            cos_sq_alpha = 1 - sin_alpha ** 2
+            # cos_sq_alpha is zero for points on the equator
+            cos_2sigma_m = np.where(cos_sq_alpha > 0, cos_sigma - 2 * sin_u1 * sin_u2 / cos_sq_alpha, 0.0)
+            c = WGS84_F / 16 * cos_sq_alpha * (4 + WGS84_F * (4 - 3 * cos_sq_alpha))
+            lam_prev = lam
+            lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+
+            not_converged = ~(np.abs(lam - lam_prev) <= VINCENTY_CONVERGENCE)
+            if not not_converged.any():
+                break
+
+        u_sq = cos_sq_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = big_b * sin_sigma * (cos_2sigma_m + big_b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        dist = WGS84_B * big_a * (sigma - delta_sigma)
+
+    dist = np.where(sin_sigma > 0, dist, 0.0)
+
+    return dist, not_converged
+
+
+def geodesic_distances(lat1, lon1, lat2, lon2):
+    """
+    The same as vincenty_inverse, but the pairs where Vincenty's formula did not converge are recomputed with geopy.
+    :return: An array of distances in meters.
+    """
+    dist, not_converged = vincenty_inverse(lat1, lon1, lat2, lon2)
+
+    if not_converged.any():
+        lat1, lon1, lat2, lon2 = np.broadcast_arrays(*[np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2)])
+        for index in map(tuple, np.argwhere(not_converged)):
+            dist[index] = distance((lat1[index], lon1[index]), (lat2[index], lon2[index])).m
+
+    return dist
+
+
+def reference_distance_matrix(lats, lons, out):
+    """
+    Computes the distance matrix with one call of geopy.distance.distance per pair of points.
+    It is very slow and is kept as a reference for checking the vectorized engine.
+
+    :param lats: An array of latitudes
+    :param lons: An array of longitudes
+    :param out: A preallocated square matrix which will be filled with distances
+    :return: The filled matrix
+    """
+    for x in range(len(lats)):
+        out[x, x] = 0
+        for y in range(x + 1, len(lats)):
+            if abs(lats[x] - lats[y]) > 0 or abs(lons[x] - lons[y]) > 0:
+                dist = distance((lats[x], lons[x]), (lats[y], lons[y])).m
+            else:
+                dist = 0
+
+            out[x, y] = dist
+            out[y, x] = dist
+
+    return out
+
+
+_worker_lats = None
+_worker_lons = None
+
+
+def _init_worker(lats, lons):
+    global _worker_lats, _worker_lons
+    _worker_lats = lats
+    _worker_lons = lons
+
+
+def _distance_block(block):
+    """Computes rows [start, stop) of the upper triangle (columns from start to the end) of the distance matrix."""
+    start, stop = block
+    return start, stop, geodesic_distances(_worker_lats[start:stop, np.newaxis], _worker_lons[start:stop, np.newaxis],
+                                           _worker_lats[np.newaxis, start:], _worker_lons[np.newaxis, start:])
+
+
+def _row_blocks(n, block_elements):
+    """Splits n rows of the upper triangle into blocks of approximately block_elements entries each."""
+    blocks = []
+    start = 0
+    while start < n:
+        rows = max(1, block_elements // max(1, n - start))
+        stop = min(n, start + rows)
+        blocks.append((start, stop))
+        start = stop
+    return blocks
+
+
+def vectorized_distance_matrix(lats, lons, out, workers=None, block_elements=BLOCK_ELEMENTS):
+    """
+    Computes the distance matrix with NumPy, several rows at a time. The blocks of rows are spread over a process pool.
+    Only the upper triangle is computed, the lower one is filled by symmetry.
+
+    :param lats: An array of latitudes
+    :param lons: An array of longitudes
+    :param out: A preallocated square matrix (e.g., a float32 array or a np.memmap) which will be filled with distances
+    :param workers: Number of worker processes. None means the number of CPUs, 1 means no process pool.
+    :param block_elements: Approximate number of matrix entries computed by one block
+    :return: The filled matrix
+    """
+    lats = np.ascontiguousarray(lats, dtype=np.float64)
+    lons = np.ascontiguousarray(lons, dtype=np.float64)
+    n = len(lats)
+    blocks = _row_blocks(n, block_elements)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(blocks))
+
+    def store(start, stop, values):
+        out[start:stop, start:] = values
+        out[start:, start:stop] = values.T
+
+    if workers <= 1:
+        _init_worker(lats, lons)
+        for block in blocks:
+            store(*_distance_block(block))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lats, lons)) as executor:
+            for done, (start, stop, values) in enumerate(executor.map(_distance_block, blocks), 1):
+                store(start, stop, values)
+                if done % max(1, len(blocks) // 10) == 0:
+                    print('Distance matrix: {}/{} blocks'.format(done, len(blocks)))
+
+    return out
+
+
+def check_against_reference(lats, lons, matrix, sample_size=200, tolerance=DISTANCE_TOLERANCE_M, seed=0):
+    """
+    Compares a sample of the matrix entries with geopy.distance.distance.
+
+    :param lats: An array of latitudes
+    :param lons: An array of longitudes
+    :param matrix: A distance matrix computed for these points
+    :param sample_size: How many random pairs of points to compare
+    :param tolerance: Maximum allowed absolute difference in meters
+    :param seed: Seed of the random generator selecting the pairs
+    :return: The maximum absolute difference in meters. Raises ValueError if it exceeds the tolerance.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(lats)
+    xs = rng.integers(0, n, sample_size)
+    ys = rng.integers(0, n, sample_size)
+    max_error = 0.0
+
+    for x, y in zip(xs, ys):
+        reference = distance((lats[x], lons[x]), (lats[y], lons[y])).m
+        max_error = max(max_error, abs(float(matrix[x, y]) - reference))
+
+    if max_error > tolerance:
+        raise ValueError('The distance matrix differs from geopy by {:.6f}m which exceeds the tolerance of {}m'.format(max_error, tolerance))
+
+    return max_error
+
+
+def project_points(lats, lons, origin_lat, origin_lon):
+    """
+    Projects points to a local plane around the origin (equirectangular projection), which is precise enough
+    for finding nearest neighbours within a region.
+    :return: An array of shape (N, 2) with x and y coordinates in meters.
+    """
+    x = np.radians(np.asarray(lons) - origin_lon) * WGS84_A * math.cos(math.radians(origin_lat))
+    y = np.radians(np.asarray(lats) - origin_lat) * WGS84_A
+    return np.column_stack((x, y))
+
+
+class SparseDistanceGraph:
+    """
+    Distances only between every point and its nearest neighbours (in both directions) and between every point and the depot.
+    The memory it uses grows linearly with the number of points.
+
+    Pairs of points which are not connected in the graph are not computed. Their distance is estimated as
+    the planar distance multiplied by missing_arc_factor, which makes the solver avoid such arcs where they are
+    still allowed (the routing model normally allows only the arcs of the graph, see compute_tours.restrict_to_graph_arcs).
+    The real length of such an arc is given by geodesic.
+    """
+    def __init__(self, indptr, indices, distances, depot, depot_distances, coordinates, missing_arc_factor, lats, lons):
+        self.indptr = indptr
+        self.indices = indices
+        self.distances = distances
+        self.depot = depot
+        self.depot_distances = depot_distances
+        self.coordinates = coordinates
+        self.missing_arc_factor = missing_arc_factor
+        self.lats = lats
+        self.lons = lons
+
+    @property
+    def shape(self):
+        return len(self.depot_distances), len(self.depot_distances)
+
+    def __len__(self):
+        return len(self.depot_distances)
+
+    @property
+    def nbytes(self):
+        return sum(x.nbytes for x in (self.indptr, self.indices, self.distances, self.depot_distances, self.coordinates, self.lats, self.lons))
+
+    def neighbours(self, x):
+        """Returns the points connected with the point x in the graph (without the depot, which is connected with all points)."""
+        return self.indices[self.indptr[x]:self.indptr[x + 1]]
+
+    def has_arc(self, x, y):
+        if x == y or x == self.depot or y == self.depot:
+            return True
+        start, stop = self.indptr[x], self.indptr[x + 1]
+        position = start + np.searchsorted(self.indices[start:stop], y)
+        return position < stop and self.indices[position] == y
+
+    def geodesic(self, x, y):
+        """Returns the real distance between two points, also if they are not connected in the graph."""
+        if self.has_arc(x, y):
+            return self[x, y]
+        return float(geodesic_distances(self.lats[x], self.lons[x], self.lats[y], self.lons[y]))
+
+    def __getitem__(self, key):
+        x, y = key
+        if x == y:
+            return 0.0
+        if x == self.depot:
+            return self.depot_distances[y]
+        if y == self.depot:
+            return self.depot_distances[x]
+
+        start, stop = self.indptr[x], self.indptr[x + 1]
+        position = start + np.searchsorted(self.indices[start:stop], y)
+        if position < stop and self.indices[position] == y:
+            return self.distances[position]
+
+        return self.missing_arc_factor * float(np.hypot(*(self.coordinates[x] - self.coordinates[y])))
+
+
+def is_sparse(distance_matrix):
+    """Checks whether the distances are given by a SparseDistanceGraph (possibly behind an expanded view of it)."""
+    return isinstance(distance_matrix, SparseDistanceGraph) or isinstance(getattr(distance_matrix, 'base', None), SparseDistanceGraph)
+
+
+def sparse_graph(distance_matrix):
+    """
+    Returns the SparseDistanceGraph behind the distances and the indices of the nodes in the graph.
+    :return: A tuple (graph, indices), or (None, None) if the distances are not given by a sparse graph
+    """
+    if isinstance(distance_matrix, SparseDistanceGraph):
+        return distance_matrix, np.arange(len(distance_matrix))
+    if isinstance(getattr(distance_matrix, 'base', None), SparseDistanceGraph):
+        return distance_matrix.base, distance_matrix.index
+    return None, None
+
+
+def build_knn_graph(lats, lons, k, depot=0, missing_arc_factor=SPARSE_MISSING_ARC_FACTOR):
+    """
+    Builds a SparseDistanceGraph connecting every point with its k nearest neighbours and with the depot.
+    The neighbours are found with a KD-tree on projected coordinates and only the geodesic distances of these arcs are computed.
+
+    :param lats: An array of latitudes
+    :param lons: An array of longitudes
+    :param k: The number of nearest neighbours of every point
+    :param depot: Index of the depot
+    :param missing_arc_factor: Factor applied to the planar distance of pairs which are not connected in the graph
+    :return: A SparseDistanceGraph
+    """
+    from scipy.spatial import cKDTree
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    n = len(lats)
+    k = min(k, n - 1)
+    coordinates = project_points(lats, lons, lats[depot], lons[depot])
+
+    _, neighbours = cKDTree(coordinates).query(coordinates, k=k + 1)
+    neighbours = neighbours.reshape(n, k + 1)
+    rows = np.repeat(np.arange(n), k + 1)
+    columns = neighbours.ravel()
+    keep = rows != columns
+
+    # An arc is kept if any of its ends is among the nearest neighbours of the other one
+    pairs = np.unique(np.concatenate((
+        np.column_stack((rows[keep], columns[keep])),
+        np.column_stack((columns[keep], rows[keep])))), axis=0)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pairs[:, 0], minlength=n), out=indptr[1:])
+
+    arc_distances = geodesic_distances(lats[pairs[:, 0]], lons[pairs[:, 0]], lats[pairs[:, 1]], lons[pairs[:, 1]])
+    depot_distances = geodesic_distances(lats[depot], lons[depot], lats, lons)
+
+    return SparseDistanceGraph(indptr, pairs[:, 1].copy(), arc_distances, depot, depot_distances, coordinates, missing_arc_factor, lats, lons)
@@ -0,0 +1,283 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import math
+import time
+
+import numpy as np
+import simplejson
+
+import compute_tours
+from distances import build_knn_graph, is_sparse, project_points, sparse_graph
+from prepare_data import subset_distance_matrix
+
+
+COARSENING_RATIO = 0.25 # The coarse problem has approximately this many super-nodes per node of the original problem
+COARSENING_NEIGHBOURS = 8 # A node is merged only with one of its nearest neighbours
+COARSE_GRAPH_NEIGHBOURS = 20 # With a sparse distance graph, the coarse problem gets its own graph connecting every super-node with this many nearest super-nodes
+COARSE_MAX_DEMAND_FRACTION = 0.5 # Maximum demand of a super-node as a fraction of the capacity of a drone. Small super-nodes are easier to pack into tours
+TWO_OPT_MAX_ROUNDS = 100 # Maximum number of improving passes of the 2-opt refinement of one tour
+REPORT_RATIOS = [1.0, 0.5, 0.25, 0.1] # Coarsening ratios compared by the report, 1.0 solves the original problem directly
+
+
+def coarsen(data, ratio=COARSENING_RATIO, max_demand=None):
+    """
+    Merges neighbouring nodes with low demand into super-nodes, in rounds: in every round the nodes are visited from the
+    lowest demand and every node is merged with its nearest neighbour which is not merged in this round yet,
+    as long as the demand of the super-node fits in max_demand and its number of stops fits in the maximum number of stops of a drone.
+
+    :param data: The data model
+    :param ratio: The target number of super-nodes divided by the number of served nodes
+    :param max_demand: Maximum demand of a super-node. Default: COARSE_MAX_DEMAND_FRACTION of the capacity of a drone
+    :return: A list of super-nodes, every super-node is a list of node indices of the data model
+    """
+    from scipy.spatial import cKDTree
+
+    points = data['all_points']
+    depot = data['depot']
+    demands = np.asarray(data['demands'])
+    counter = np.asarray(data['counter'])
+    max_number_of_stops = data['vehicle_max_number_of_stops'][0]
+    if max_demand is None:
+        max_demand = max(1, int(data['vehicle_capacities'][0] * COARSE_MAX_DEMAND_FRACTION))
+
+    nodes = [node for node in range(len(demands)) if node != depot]
+    coordinates = project_points(points.lat, points.lon, points.lat[depot], points.lon[depot])
+    target = max(1, math.ceil(len(nodes) * ratio))
+
+    clusters = [[node] for node in nodes]
+    while len(clusters) > target:
+        cluster_demands = np.array([demands[cluster].sum() for cluster in clusters])
+        cluster_stops = np.array([counter[cluster].sum() for cluster in clusters])
+        centroids = np.array([coordinates[cluster].mean(axis=0) for cluster in clusters])
+        k = min(COARSENING_NEIGHBOURS + 1, len(clusters))
+        _, neighbours = cKDTree(centroids).query(centroids, k=k)
+        neighbours = neighbours.reshape(len(clusters), k)
+
+        matched = np.zeros(len(clusters), dtype=bool)
+        merged = []
+        remaining = len(clusters)
+        for cluster in np.argsort(cluster_demands, kind='stable'):
+            if matched[cluster]:
+                continue
+            matched[cluster] = True
+            partner = None
+            if remaining > target:
+                for neighbour in neighbours[cluster]:
+                    if (not matched[neighbour] and cluster_demands[cluster] + cluster_demands[neighbour] <= max_demand
+                            and cluster_stops[cluster] + cluster_stops[neighbour] <= max_number_of_stops):
+                        partner = neighbour
+                        break
+            if partner is None:
+                merged.append(clusters[cluster])
+            else:
+                matched[partner] = True
+                merged.append(clusters[cluster] + clusters[partner])
+                remaining -= 1
+
+        if len(merged) == len(clusters):
+            break
+        clusters = merged
+
+    return clusters
+
+
+def coarse_data_model(data, clusters):
+    """
+    Creates the data model of the coarse CVRP. Every super-node is placed at its member closest to the centroid of the members,
+    its demand is the total demand of the members and its counter is the number of stops of the members.
+    With a sparse distance graph, most of the neighbours of a super-node are merged into it, so the arcs between super-nodes
+    would mostly be charged the penalty of the missing arcs. A k-nearest-neighbours graph of the super-nodes is built instead.
+    """
+    points = data['all_points']
+    depot = data['depot']
+    coordinates = project_points(points.lat, points.lon, points.lat[depot], points.lon[depot])
+
+    representatives = []
+    for cluster in clusters:
+        members = coordinates[cluster]
+        representatives.append(cluster[int(np.argmin(((members - members.mean(axis=0)) ** 2).sum(axis=1)))])
+
+    indices = np.array([depot] + representatives, dtype=np.int64)
+    demands = [0] + [int(sum(data['demands'][node] for node in cluster)) for cluster in clusters]
+    counter = [0] + [int(sum(data['counter'][node] for node in cluster)) for cluster in clusters]
+    drones_capacity = data['vehicle_capacities'][0]
+    max_number_of_stops = data['vehicle_max_number_of_stops'][0]
+    # large super-nodes leave more unused capacity in the tours, so the fleet gets a larger margin
+    number_of_vehicles = compute_tours.fleet_size(demands, counter, drones_capacity, max_number_of_stops,
+                                                  compute_tours.FLEET_MARGIN + max(demands) / drones_capacity)
+
+    coarse_points = points.take(indices)
+    coarse_points.population = np.array(demands)
+
+    if is_sparse(data['distance_matrix']):
+        graph, _ = sparse_graph(data['distance_matrix'])
+        distance_matrix = build_knn_graph(coarse_points.lat, coarse_points.lon, COARSE_GRAPH_NEIGHBOURS, depot=0,
+                                          missing_arc_factor=graph.missing_arc_factor)
+    else:
+        distance_matrix = subset_distance_matrix(data['distance_matrix'], indices)
+
+    return {
+        'all_points': coarse_points,
+        'distance_matrix': distance_matrix,
+        'demands': demands,
+        'counter': counter,
+        'vehicle_capacities': [drones_capacity for _ in range(number_of_vehicles)],
+        'vehicle_max_number_of_stops': [max_number_of_stops for _ in range(number_of_vehicles)],
+        'num_vehicles': number_of_vehicles,
+        'depot': 0
+    }
+
+
+def expand_routes(data, clusters, coarse_routes):
+    """
+    Replaces every super-node of the coarse routes by its members. The members are visited in the nearest neighbour order,
+    starting from the previous stop of the route.
+    :return: A list of routes (lists of node indices of the data model starting at the depot)
+    """
+    routes = []
+    for coarse_route in coarse_routes:
+        route = [data['depot']]
+        for super_node in coarse_route[1:]:
+            members = list(clusters[super_node - 1])
+            while members:
+                closest = min(members, key=lambda node: compute_tours.arc_distance(data, route[-1], node))
+                members.remove(closest)
+                route.append(closest)
+        routes.append(route)
+    return routes
+
+
+def two_opt(data, route, max_rounds=TWO_OPT_MAX_ROUNDS):
+    """
+    Improves a single tour by reversing its segments as long as it makes the tour shorter.
+    :param data: The data model
+    :param route: A list of node indices starting at the depot
+    :return: The improved route
+    """
+    if len(route) < 4:
+        return route
+
+    tour = route + [data['depot']]
+    n = len(tour)
+    distance = np.array([[compute_tours.arc_distance(data, a, b) for b in tour] for a in tour], dtype=np.int64)
+    order = np.arange(n)
+
+    for _ in range(max_rounds):
+        improved = False
+        for i in range(1, n - 2):
+            a, b = order[i - 1], order[i]
+            # gain of reversing the segment order[i:j + 1] for every j at once
+            c, d = order[i + 1:n - 1], order[i + 2:n]
+            gains = distance[a, b] + distance[c, d] - distance[a, c] - distance[b, d]
+            j = int(np.argmax(gains))
+            if gains[j] > 0:
+                order[i:i + j + 2] = order[i:i + j + 2][::-1]
+                improved = True
+        if not improved:
+            break
+
+    return [tour[k] for k in order[:-1]]
+
+
+def solve_multilevel(data, ratio=COARSENING_RATIO, time_limit=compute_tours.HEURISTIC_TIME_LIMIT, report=None):
+    """
+    Coarsen-solve-refine: merges neighbouring nodes into super-nodes (see coarsen), solves the coarse CVRP with the
+    model from compute_tours, expands the super-nodes back into their stops and refines every tour with 2-opt.
+    The capacity and the number of stops of every tour stay the same when the super-nodes are expanded.
+
+    :param data: The data model
+    :param ratio: The target number of super-nodes divided by the number of served nodes
+    :param time_limit: Time limit of the solver in seconds
+    :param report: If a dictionary is given, the sizes, times and distances of every step are stored in it
+    :return: A list of routes (lists of node indices starting at the depot) or None if no solution was found
+    """
+    start = time.time()
+    clusters = coarsen(data, ratio)
+    coarse_data = coarse_data_model(data, clusters)
+    coarsen_time = time.time() - start
+    print('Coarsened {} nodes into {} super-nodes in {:.1f}s'.format(len(data['demands']) - 1, len(clusters), coarsen_time))
+
+    start = time.time()
+    coarse_routes = compute_tours.solve_data_model(coarse_data, time_limit, log_search=False)
+    solve_time = time.time() - start
+    if coarse_routes is None:
+        print('No solution was found for the coarse problem')
+        return None
+
+    start = time.time()
+    routes = expand_routes(data, clusters, coarse_routes)
+    expanded_distance = sum(compute_tours.route_distance(data, route) for route in routes)
+    routes = [two_opt(data, route) for route in routes]
+    refine_time = time.time() - start
+    distance = sum(compute_tours.route_distance(data, route) for route in routes)
+    print('Expanded tours: {}m, after 2-opt: {}m ({:.1f}s)'.format(expanded_distance, distance, refine_time))
+
+    if report is not None:
+        report.update({
+            'ratio': ratio,
+            'number_of_nodes': len(data['demands']) - 1,
+            'number_of_super_nodes': len(clusters),
+            'coarsen_time': coarsen_time,
+            'solve_time': solve_time,
+            'refine_time': refine_time,
+            'expanded_distance': expanded_distance,
+            'distance': distance,
+            'number_of_routes': len(routes),
+        })
+
+    return routes
+
+
+def coarsening_report(data, ratios=REPORT_RATIOS, time_limit=compute_tours.HEURISTIC_TIME_LIMIT, filename=None):
+    """
+    Solves the problem with every coarsening ratio (1.0 means solving the original problem directly) with the same time limit
+    and reports the time and the total distance of the tours for each of them.
+    :param data: The data model
+    :param ratios: A list of coarsening ratios
+    :param time_limit: Time limit of the solver in seconds
+    :param filename: If set, the report is saved to this file
+    :return: A list of dictionaries, one for every ratio
+    """
+    results = []
+    for ratio in ratios:
+        if ratio >= 1:
+            start = time.time()
+            routes = compute_tours.solve_data_model(data, time_limit, log_search=False)
+            result = {'ratio': 1.0, 'number_of_nodes': len(data['demands']) - 1, 'number_of_super_nodes': len(data['demands']) - 1,
+                      'solve_time': time.time() - start, 'coarsen_time': 0, 'refine_time': 0,
+                      'distance': sum(compute_tours.route_distance(data, route) for route in routes) if routes is not None else None}
+        else:
+            result = {}
+            solve_multilevel(data, ratio, time_limit, report=result)
+        results.append(result)
+        print('Ratio {}: {} super-nodes, {:.1f}s, {}m'.format(
+            ratio, result.get('number_of_super_nodes'), result.get('coarsen_time', 0) + result.get('solve_time', 0) + result.get('refine_time', 0),
+            result.get('distance')))
+
+    if filename is not None:
+        with open(filename, 'w') as f:
+            simplejson.dump({'time_limit': time_limit, 'results': results}, f, indent=2)
+
+    return results
+
+
+def main():
+    data = compute_tours.create_data_model(compute_tours.MAX_POINT_DEMAND, compute_tours.USE_CACHE, compute_tours.SPARSE_NEIGHBOURS)
+    coarsening_report(data, REPORT_RATIOS, compute_tours.HEURISTIC_TIME_LIMIT,
+                      './results/multilevel_report_{}_{}.json'.format(compute_tours.DRONES_CAPACITY, compute_tours.MAX_POINT_DEMAND))
+
+
+if __name__ == '__main__':
+    main()
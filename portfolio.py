@@ -0,0 +1,215 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import simplejson
+from ortools.constraint_solver import routing_enums_pb2
+
+import compute_tours
+
+
+PORTFOLIO_FIRST_SOLUTION_STRATEGIES = ['PATH_CHEAPEST_ARC', 'SAVINGS', 'PARALLEL_CHEAPEST_INSERTION', 'CHRISTOFIDES'] # Names from routing_enums_pb2.FirstSolutionStrategy
+PORTFOLIO_METAHEURISTICS = ['GUIDED_LOCAL_SEARCH', 'SIMULATED_ANNEALING', 'TABU_SEARCH'] # Names from routing_enums_pb2.LocalSearchMetaheuristic
+PORTFOLIO_SEEDS = [0] # Seeds of the random perturbation of the arc costs (0 means the original costs), every combination of a strategy, a metaheuristic and a seed is one configuration
+PORTFOLIO_COST_PERTURBATION = 0.02 # With a non-zero seed, the cost of every arc is increased by up to this fraction, so the same strategy and metaheuristic find different solutions
+PORTFOLIO_WORKERS = None # How many configurations are solved at the same time. None means the number of CPUs
+PORTFOLIO_TARGET_OBJECTIVE = None # If set, all configurations stop as soon as one of them finds a solution with at most this total distance
+PORTFOLIO_HISTORY_FILENAME = './results/portfolio_history.json' # The winning configuration of every run is appended here
+STOP_CHECK_INTERVAL = 1000 # The shared stop flag is checked once per this many checks of the search limit
+
+
+_worker_data = None
+_worker_stop = None
+_worker_deadline = None
+
+
+def portfolio_configurations(strategies=None, metaheuristics=None, seeds=None):
+    """Returns all combinations of first solution strategies, metaheuristics and seeds as a list of dictionaries."""
+    return [{'first_solution_strategy': strategy, 'metaheuristic': metaheuristic, 'seed': seed}
+            for strategy, metaheuristic, seed in itertools.product(strategies or PORTFOLIO_FIRST_SOLUTION_STRATEGIES,
+                                                                   metaheuristics or PORTFOLIO_METAHEURISTICS,
+                                                                   seeds or PORTFOLIO_SEEDS)]
+
+
+def configuration_name(configuration):
+    return '{first_solution_strategy}/{metaheuristic}/{seed}'.format(**configuration)
+
+
+def cost_perturbation(number_of_nodes, seed, amplitude=PORTFOLIO_COST_PERTURBATION):
+    """
+    Returns the factors of the random perturbation of the arc costs for compute_tours.build_routing_model,
+    or None for the seed 0 (the original costs).
+    """
+    if not seed:
+        return None
+    return amplitude * np.random.default_rng(seed).random(number_of_nodes)
+
+
+def total_distance(data, routes):
+    return sum(compute_tours.route_distance(data, route) for route in routes)
+
+
+def _init_worker(data, stop, deadline):
+    global _worker_data, _worker_stop, _worker_deadline
+    _worker_data = data
+    _worker_stop = stop
+    _worker_deadline = deadline
+
+
+def _solve_configuration(args):
+    """
+    Solves the CVRP with one configuration until the deadline, or until another worker signals that the target is reached.
+    :return: A dictionary with the configuration, its result and its routes
+    """
+    configuration, time_limit, target_objective, first_solution_retries = args
+    data = _worker_data
+    result = {'configuration': configuration, 'objective': None, 'routes': None}
+    remaining = min(time_limit, _worker_deadline - time.time())
+    if _worker_stop.is_set() or remaining < 1:
+        result['status'] = 'skipped'
+        return result
+
+    transit_mode = 'callback' if compute_tours.is_sparse(data['distance_matrix']) else compute_tours.TRANSIT_MODE
+    cost_noise = cost_perturbation(len(data['demands']), configuration['seed'])
+    manager, routing = compute_tours.build_routing_model(data, transit_mode, cost_noise)
+    search_parameters = compute_tours.create_search_parameters(remaining, log_search=False)
+    search_parameters.first_solution_strategy = getattr(routing_enums_pb2.FirstSolutionStrategy, configuration['first_solution_strategy'])
+    search_parameters.local_search_metaheuristic = getattr(routing_enums_pb2.LocalSearchMetaheuristic, configuration['metaheuristic'])
+
+    start = time.time()
+    trace = []
+
+    def at_solution():
+        # with a non-zero seed the objective includes the perturbation
+        objective = routing.CostVar().Value()
+        trace.append((time.time() - start, compute_tours.to_meters(objective)))
+        if target_objective is None:
+            return
+        if cost_noise is None:
+            distance = compute_tours.to_meters(objective)
+        elif objective > target_objective * (1 + PORTFOLIO_COST_PERTURBATION) * compute_tours.DISTANCE_SCALE:
+            # the perturbation increases every arc by at most PORTFOLIO_COST_PERTURBATION, so the tours cannot reach the target
+            return
+        else:
+            distance = total_distance(data, compute_tours.routes_from_assignment(data, manager, routing))
+        if distance <= target_objective:
+            _worker_stop.set()
+
+    checks = itertools.count()
+
+    def should_stop():
+        # the search limit is checked very often, reading the shared flag every time would slow the search down
+        return next(checks) % STOP_CHECK_INTERVAL == 0 and _worker_stop.is_set()
+
+    routing.AddAtSolutionCallback(at_solution)
+    routing.AddSearchMonitor(routing.solver().CustomLimit(should_stop))
+    limit = (compute_tours.first_solution_time_limit(len(data['demands']), remaining, first_solution_retries)
+             if first_solution_retries is not None else None)
+    stopped_without_solution = compute_tours.add_first_solution_limit(routing, limit) if limit is not None else lambda: False
+    assignment = routing.SolveWithParameters(search_parameters)
+
+    result['wall_time'] = time.time() - start
+    result['number_of_solutions'] = len(trace)
+    result['time_to_best'] = trace[-1][0] if trace else None
+    if not assignment:
+        result['status'] = 'failed'
+        result['fleet_is_too_small'] = compute_tours.fleet_is_too_small(routing)
+        result['stopped_without_solution'] = stopped_without_solution()
+        return result
+
+    result['status'] = 'stopped' if _worker_stop.is_set() else 'done'
+    result['routes'] = compute_tours.routes_from_assignment(data, manager, routing, assignment)
+    result['objective'] = total_distance(data, result['routes'])
+    return result
+
+
+def solve_portfolio(data, time_limit=compute_tours.HEURISTIC_TIME_LIMIT, configurations=None, workers=PORTFOLIO_WORKERS,
+                    target_objective=PORTFOLIO_TARGET_OBJECTIVE, report_filename=None, first_solution_retries=None, statistics=None):
+    """
+    Solves the CVRP with several configurations of the solver at the same time, each in its own process, and keeps the best solution.
+    All configurations share one time budget. Once one of the processes finds tours with at most target_objective total
+    distance, the other processes stop their search and return their best solutions.
+    The configurations are compared by the total distance of their tours in meters.
+
+    :param data: The data model
+    :param time_limit: Total time budget in seconds. It is divided between the configurations according to the number of workers.
+    :param configurations: A list of configurations as returned by portfolio_configurations. Default: all combinations of the PORTFOLIO_* lists
+    :param workers: How many configurations are solved at the same time. None means the number of CPUs.
+    :param target_objective: If set, the search stops once a solution with at most this total distance is found
+    :param report_filename: If set, the result of every configuration and the winner are saved to this file
+    :param first_solution_retries: If set, every configuration stops when it finds no solution within
+    compute_tours.first_solution_time_limit for this number of retries. Default: None (no first solution limit)
+    :param statistics: If a dictionary is given and no configuration found a solution, "fleet_is_too_small" is True in it
+    if some of them failed in a way which more vehicles may fix (see compute_tours.fleet_is_too_small), and
+    "stopped_without_solution" is True if some of them reached the first solution limit
+    :return: A list of routes (lists of node indices starting at the depot) or None if no configuration found a solution
+    """
+    configurations = configurations or portfolio_configurations()
+    workers = min(workers or os.cpu_count() or 1, len(configurations))
+    stop = multiprocessing.Event()
+    deadline = time.time() + time_limit
+    configuration_time_limit = max(1, time_limit * workers // len(configurations))
+    print('Solving {} configurations with {} workers, {}s per configuration'.format(len(configurations), workers, configuration_time_limit))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data, stop, deadline)) as executor:
+        futures = [executor.submit(_solve_configuration, (configuration, configuration_time_limit, target_objective, first_solution_retries))
+                   for configuration in configurations]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print('{}: {}, objective {}'.format(configuration_name(result['configuration']), result['status'], result['objective']))
+
+    solved = [result for result in results if result['objective'] is not None]
+    winner = min(solved, key=lambda result: result['objective']) if solved else None
+
+    if statistics is not None:
+        statistics['fleet_is_too_small'] = winner is None and any(result.get('fleet_is_too_small') for result in results)
+        statistics['stopped_without_solution'] = winner is None and any(result.get('stopped_without_solution') for result in results)
+
+    if winner is not None:
+        print('Best configuration: {}, objective {}'.format(configuration_name(winner['configuration']), winner['objective']))
+
+    if report_filename is not None:
+        report = {
+            'time_limit': time_limit,
+            'target_objective': target_objective,
+            'workers': workers,
+            'winner': winner['configuration'] if winner is not None else None,
+            'objective': winner['objective'] if winner is not None else None,
+            'configurations': [{key: value for key, value in result.items() if key != 'routes'} for result in results],
+        }
+        with open(report_filename, 'w') as f:
+            simplejson.dump(report, f, indent=2)
+        append_history(report_filename, report)
+
+    return winner['routes'] if winner is not None else None
+
+
+def append_history(report_filename, report, filename=PORTFOLIO_HISTORY_FILENAME):
+    """Appends the winner of a run to the history, which shows which configurations win most often."""
+    history = []
+    if os.path.exists(filename):
+        with open(filename, 'r') as f:
+            history = simplejson.load(f)
+    history.append({'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'report': report_filename, 'winner': report['winner'],
+                    'objective': report['objective'], 'time_limit': report['time_limit']})
+    with open(filename, 'w') as f:
+        simplejson.dump(history, f, indent=2)
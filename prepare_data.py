@@ -11,17 +11,22 @@
 # THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
-import pickle
-from copy import deepcopy
-from os import path
+import re
+from array import array
 
-from geopy.distance import distance
-import math
 import numpy as np
 import simplejson
 
+import distance_cache
+import distances
+from profiling import stage
+
 
 HOSPITAL = {'lon': 16.1788, 'lat': 58.5633, 'Population': 0} # Location of the test distribution center
+DATA_FILENAME = 'centroids100x100.geojson' # Geojson file with the population data
+STREAM_CHUNK_SIZE = 2**20 # Number of characters read at a time when parsing the geojson file
+DISTANCE_METHOD = 'vectorized' # 'vectorized' computes the distance matrix with NumPy in a process pool, 'geopy' uses the slow reference implementation
+REFERENCE_CHECK_SAMPLE = 200 # Number of random entries of a matrix computed by the vectorized method which are compared with geopy (see distances.check_against_reference). 0 disables the check
 
 
 def near_split(x, num_bins):
@@ -41,47 +46,174 @@ def near_split(x, num_bins):
     return res
 
 
-def load_data():
+class Points:
+    """
+    Points stored column-wise: longitudes, latitudes and populations are kept in three NumPy arrays.
+    Indexing with an integer returns the point as a dictionary in the same format as HOSPITAL, so the points can be
+    written to the results as before.
+    """
+    def __init__(self, lon, lat, population):
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.population = np.asarray(population, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.lon)
+
+    def __getitem__(self, i):
+        return {'lon': float(self.lon[i]), 'lat': float(self.lat[i]), 'Population': int(self.population[i])}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def take(self, indices):
+        """Returns new Points consisting of the points with the given indices (in the given order)."""
+        return Points(self.lon[indices], self.lat[indices], self.population[indices])
+
+
+def iter_features(f, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Incrementally parses the "features" array of a geojson file and yields the features one by one,
+    so only one chunk of the file and one feature are kept in memory at a time.
+
+    :param f: A file opened in text mode
+    :param chunk_size: How many characters are read from the file at a time
+    :return: A generator of features (dictionaries)
+    """
+    decoder = simplejson.JSONDecoder()
+    features_start = re.compile(r'"features"\s*:\s*\[')
+    buffer = ''
+    eof = False
+
+    while True:
+        match = features_start.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            raise ValueError('The file does not contain a "features" array')
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        # keep the tail in case the key is split between two chunks
+        buffer = buffer[-32:] + chunk
+
+    position = 0
+    while True:
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] == ','):
+            position += 1
+
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        try:
+            if position == len(buffer):
+                raise simplejson.JSONDecodeError('Need more data', buffer, position)
+            feature, position = decoder.raw_decode(buffer, position)
+        except simplejson.JSONDecodeError:
+            if eof:
+                raise ValueError('The "features" array is truncated')
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield feature
+
+
+def load_data(filename=DATA_FILENAME):
     """
     Loads the data from geojson file obtained from QGIS. The data consists of points with associated population values.
-    :return:
+    The file is parsed incrementally and only the points with positive population are kept.
+    :param filename: Path to the geojson file
+    :return: Points where the first point is the HOSPITAL
     """
-    data = simplejson.load(open('centroids100x100.geojson', 'r'))
-    all_points = [HOSPITAL]
+    lon = array('d', [HOSPITAL['lon']])
+    lat = array('d', [HOSPITAL['lat']])
+    population = array('q', [HOSPITAL['Population']])
 
-    for feature in data['features']:
-        if feature['properties']['TotBef'] > 0:
-            all_points.append({
-                'lon': feature['geometry']['coordinates'][0],
-                'lat': feature['geometry']['coordinates'][1],
-                'Population': feature['properties']['TotBef']
-            })
+    with open(filename, 'r') as f:
+        for feature in iter_features(f):
+            if feature['properties']['TotBef'] > 0:
+                lon.append(feature['geometry']['coordinates'][0])
+                lat.append(feature['geometry']['coordinates'][1])
+                population.append(feature['properties']['TotBef'])
 
-    return all_points
+    return Points(np.frombuffer(lon, dtype=np.float64), np.frombuffer(lat, dtype=np.float64),
+                  np.frombuffer(population, dtype=np.int64))
 
 
-def compute_distance_matrix(all_points):
+def compute_distance_matrix(all_points, method=DISTANCE_METHOD, workers=None, dtype=np.float64, out=None):
     """
     Computes a distance matrix between all pairs of points
-    :param all_points: A list of points
+    :param all_points: Points
+    :param method: "vectorized" for the batched NumPy engine or "geopy" for the (slow) reference implementation
+    :param workers: Number of worker processes used by the vectorized engine. None means the number of CPUs.
+    :param dtype: Type of the matrix entries if "out" is not given, e.g., np.float32 to halve the memory usage
+    :param out: A preallocated square matrix (e.g., a np.memmap) to write the distances to. Default: a new array
     :return: A matrix where every entry represents the distance between corresponding points
     """
-    distance_matrix = np.zeros((len(all_points), len(all_points)))
+    lats = all_points.lat
+    lons = all_points.lon
+
+    if out is None:
+        out = np.zeros((len(all_points), len(all_points)), dtype=dtype)
+
+    if method == 'vectorized':
+        distances.vectorized_distance_matrix(lats, lons, out, workers=workers)
+        if REFERENCE_CHECK_SAMPLE:
+            max_error = distances.check_against_reference(lats, lons, out, sample_size=REFERENCE_CHECK_SAMPLE)
+            print('Distance matrix agrees with geopy within {:.6f}m on {} sampled pairs'.format(max_error, REFERENCE_CHECK_SAMPLE))
+        return out
+    elif method == 'geopy':
+        return distances.reference_distance_matrix(lats, lons, out)
+    else:
+        raise ValueError('Unknown distance method "{}"'.format(method))
+
+
+class ExpandedDistanceMatrix:
+    """
+    A lazy view of a distance matrix where several rows and columns may refer to the same row or column of the base matrix.
+    Entries are read from the base matrix on demand, so the expanded matrix is never copied unless it is converted to
+    an array with np.asarray (which is a single fancy-indexed gather).
+    """
+    def __init__(self, base, index):
+        self.base = base
+        self.index = np.asarray(index, dtype=np.int64)
+
+    @property
+    def shape(self):
+        return len(self.index), len(self.index)
 
-    for x in range(len(all_points)):
-        print(x)
-        for y in range(x + 1, len(all_points)):
-            p1 = all_points[x]
-            p2 = all_points[y]
-            if abs(p1['lat'] - p2['lat']) > 0 or abs(p1['lon'] - p2['lon']) > 0:
-                dist = distance((p1['lat'], p1['lon']), (p2['lat'], p2['lon'])).m
-            else:
-                dist = 0
+    def __len__(self):
+        return len(self.index)
 
-            distance_matrix[x, y] = dist
-            distance_matrix[y, x] = dist
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            x, y = key
+            return self.base[self.index[x], self.index[y]]
+        return np.asarray(self.base[self.index[key]])[self.index]
 
-    return distance_matrix
+    def __array__(self, dtype=None, copy=None):
+        res = np.asarray(self.base)[np.ix_(self.index, self.index)]
+        return res if dtype is None else res.astype(dtype)
+
+    def take(self, indices):
+        """Returns a view of the rows and columns with the given indices, still referring to the same base matrix."""
+        return ExpandedDistanceMatrix(self.base, self.index[indices])
+
+
+def subset_distance_matrix(distance_matrix, indices):
+    """
+    Returns a view of the distances between the points with the given indices without copying the matrix.
+    :param distance_matrix: A distance matrix, an ExpandedDistanceMatrix or a sparse distance graph
+    :param indices: Indices of the points
+    :return: An ExpandedDistanceMatrix
+    """
+    if isinstance(distance_matrix, ExpandedDistanceMatrix):
+        return distance_matrix.take(indices)
+    return ExpandedDistanceMatrix(distance_matrix, indices)
 
 
 def split_dense_points(orig_points, orig_distance_matrix, max_point_capacity):
@@ -91,63 +223,144 @@ def split_dense_points(orig_points, orig_distance_matrix, max_point_capacity):
     It is used because Google OR-tools does not work with the case, when a vehicle has to serve the same point twice,
     so problem instances where some point has demand exceeding vehicles capacity are becoming infeasible.
 
-    :param orig_points: A list of points
+    The population of a split point is divided as in near_split.
+
+    :param orig_points: Points
     :param orig_distance_matrix: A distance matrix
     :param max_point_capacity: Maximum capacity which can be assigned to a point.
-    :return: A new list of points and a new distance matrix
+    :return: New points and an ExpandedDistanceMatrix view of the original distance matrix.
+    The indices of the original points are available as the "index" attribute of the view.
     """
-    points = []
-    indices_of_orig_points = []
+    orig_population = orig_points.population
+    num_bins = np.where(orig_population > 0, -(-orig_population // max_point_capacity), 1)
+    quotient, remainder = np.divmod(orig_population, num_bins)
+
+    indices_of_orig_points = np.repeat(np.arange(len(orig_points)), num_bins)
+    first_copy = np.repeat(np.cumsum(num_bins) - num_bins, num_bins)
+    copy_number = np.arange(len(indices_of_orig_points)) - first_copy
+    population = quotient[indices_of_orig_points] + (copy_number < remainder[indices_of_orig_points])
+
+    points = orig_points.take(indices_of_orig_points)
+    points.population = population
+
+    return points, ExpandedDistanceMatrix(orig_distance_matrix, indices_of_orig_points)
+
+
+class FullLoadTrips:
+    """
+    Direct trips from the depot to a point and back, every one carrying a full drone.
+    They are served without the routing solver, so only the remaining population of a point stays in the routing problem.
+    """
+    def __init__(self, points, trips, capacity, depot_distances, return_distances):
+        self.points = points
+        self.trips = np.asarray(trips, dtype=np.int64)
+        self.capacity = capacity
+        self.depot_distances = np.asarray(depot_distances, dtype=np.float64)
+        self.return_distances = np.asarray(return_distances, dtype=np.float64)
+
+    def __len__(self):
+        return int(self.trips.sum())
+
+    @property
+    def total_load(self):
+        return len(self) * self.capacity
+
 
-    for i in range(len(orig_points)):
-        point = orig_points[i]
+def split_full_loads(orig_points, orig_distance_matrix, drones_capacity, max_point_capacity):
+    """
+    Split delivery without cloning every point: a point with population p gets floor(p / drones_capacity) direct trips
+    with a full drone, which are optimal for this part of the demand as no other stop fits in these trips.
+    Only the remaining population (less than drones_capacity) is left to the routing solver, split by split_dense_points,
+    and points with nothing left are removed. This serves the same demand with much fewer nodes in dense areas.
+
+    :param orig_points: Points where the first point is the depot
+    :param orig_distance_matrix: A distance matrix or a sparse distance graph
+    :param drones_capacity: Capacity of a single drone
+    :param max_point_capacity: Maximum capacity which can be assigned to a point of the routing problem
+    :return: New points, an ExpandedDistanceMatrix view of the original distance matrix and FullLoadTrips
+    """
+    orig_population = orig_points.population
+    trips = orig_population // drones_capacity
+    trips[0] = 0 # the depot
+    residual = orig_population - trips * drones_capacity
 
-        if point['Population'] > 0:
-            num_bins = math.ceil(point['Population'] / max_point_capacity)
-            for population in near_split(point['Population'], num_bins):
-                new_point = deepcopy(point)
-                new_point['Population'] = population
-                points.append(new_point)
-                indices_of_orig_points.append(i)
-        else:
-            points.append(point)
-            indices_of_orig_points.append(i)
+    keep = np.flatnonzero(residual > 0)
+    keep = np.concatenate(([0], keep[keep != 0]))
+    residual_points = orig_points.take(keep)
+    residual_points.population = residual[keep]
+    points, distance_matrix = split_dense_points(residual_points, orig_distance_matrix, max_point_capacity)
+    # split_dense_points indexes the residual points, the view has to refer to the original ones
+    distance_matrix = ExpandedDistanceMatrix(orig_distance_matrix, keep[distance_matrix.index])
 
-    distance_matrix = np.zeros((len(points), len(points)))
+    served = np.flatnonzero(trips > 0)
+    full_load_points = orig_points.take(served)
+    full_load_points.population = np.full(len(served), drones_capacity)
+    full_loads = FullLoadTrips(full_load_points, trips[served], drones_capacity,
+                               [float(orig_distance_matrix[0, i]) for i in served],
+                               [float(orig_distance_matrix[i, 0]) for i in served])
 
-    for x in range(distance_matrix.shape[0]):
-        for y in range(distance_matrix.shape[1]):
-            distance_matrix[x][y] = orig_distance_matrix[indices_of_orig_points[x]][indices_of_orig_points[y]]
+    print('Split delivery: {} full load trips to {} points, {} nodes left for the routing solver (instead of {})'.format(
+        len(full_loads), len(served), len(points), int(np.where(orig_population > 0, -(-orig_population // max_point_capacity), 1).sum())))
 
-    return points, distance_matrix
+    return points, distance_matrix, full_loads
 
 
-def create_data_model(max_point_capacity, use_cache=True):
-    all_points = load_data()
+def split_points(orig_points, orig_distance_matrix, max_point_capacity, full_load_capacity=None):
+    """
+    Splits the points with split_full_loads if full_load_capacity is set, otherwise with split_dense_points.
+    :return: New points, a view of the distance matrix and FullLoadTrips (None for split_dense_points)
+    """
+    if full_load_capacity is None:
+        points, distance_matrix = split_dense_points(orig_points, orig_distance_matrix, max_point_capacity)
+        return points, distance_matrix, None
+    return split_full_loads(orig_points, orig_distance_matrix, full_load_capacity, max_point_capacity)
 
-    if use_cache:
-        filename = 'results/distance_matrix.p'
 
-        if not path.exists(filename):
-            distance_matrix = compute_distance_matrix(all_points)
-            with open(filename, 'wb') as f:
-                pickle.dump(distance_matrix, f)
-        else:
-            with open(filename, 'rb') as f:
-                distance_matrix = pickle.load(f)
+def load_distance_matrix(all_points, use_cache=True, neighbours=None):
+    """
+    Computes the distances between the points (before splitting), or loads them from the cache.
+    :param all_points: Points where the first point is the HOSPITAL
+    :param use_cache: If True then the dense distance matrix is cached on the hard drive.
+    :param neighbours: If set to an integer k, a sparse k-nearest-neighbours graph is built instead of the dense matrix.
+    :return: A distance matrix or a sparse distance graph
+    """
+    if neighbours is not None:
+        return distances.build_knn_graph(all_points.lat, all_points.lon, neighbours, depot=0)
+    elif use_cache:
+        return distance_cache.load_or_compute(all_points.lat, all_points.lon, HOSPITAL, DISTANCE_METHOD,
+                                              lambda out: compute_distance_matrix(all_points, out=out))
     else:
-        distance_matrix = compute_distance_matrix(all_points)
+        return compute_distance_matrix(all_points)
 
-    splitted_points, splitted_distance_matrix = split_dense_points(all_points, distance_matrix, max_point_capacity)
+
+def create_data_model(max_point_capacity, use_cache=True, neighbours=None, full_load_capacity=None):
+    with stage('load_data'):
+        all_points = load_data()
+    with stage('distance_matrix', number_of_points=len(all_points)):
+        distance_matrix = load_distance_matrix(all_points, use_cache=use_cache, neighbours=neighbours)
+
+    with stage('split'):
+        splitted_points, splitted_distance_matrix, full_loads = split_points(all_points, distance_matrix, max_point_capacity, full_load_capacity)
 
     data = {
         'distance_matrix': splitted_distance_matrix,
-        'all_points': splitted_points
+        'all_points': splitted_points,
+        'full_loads': full_loads
     }
 
     return data
 
 
-def prepare_data(max_point_capacity, use_cache=True):
-    res = create_data_model(max_point_capacity, use_cache=use_cache)
+def prepare_data(max_point_capacity, use_cache=True, neighbours=None, full_load_capacity=None):
+    """
+    Loads the points, computes the distances between them and splits the points with high population.
+    :param max_point_capacity: Maximum capacity which can be assigned to a point.
+    :param use_cache: If True then the dense distance matrix is cached on the hard drive.
+    :param neighbours: If set to an integer k, only the distances from every point to its k nearest neighbours and
+    to the depot are computed (see distances.build_knn_graph) instead of the dense distance matrix.
+    :param full_load_capacity: If set to the capacity of a drone, full drone loads are served by direct trips
+    (see split_full_loads) and only the rest of the population is split between several points.
+    :return: A dictionary with "all_points", "distance_matrix" and "full_loads"
+    """
+    res = create_data_model(max_point_capacity, use_cache=use_cache, neighbours=neighbours, full_load_capacity=full_load_capacity)
     return res
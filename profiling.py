@@ -0,0 +1,159 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import cProfile
+import io
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import simplejson
+
+
+PROFILE_STAGE = None # Name of one stage (e.g. 'solve') which is captured in detail. None disables the capture
+PROFILE_CAPTURE = 'cprofile' # 'cprofile' saves the profile of the stage to results/profile_{stage}.prof, 'tracemalloc' records the lines which allocated the most memory in the stage
+PROFILE_TOP = 20 # How many functions (or lines) of the capture are printed and stored in the report
+
+
+_records = []
+_stack = []
+_start = time.time()
+
+
+def _peak_rss_mb():
+    """Returns the peak resident set size of the process since the last reset_peak_rss (or since it started) in MB."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 1024)
+
+
+def _reset_peak_rss():
+    """Resets the peak resident set size (Linux only). Returns False if it is not possible, the peak is then the peak of the whole process."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Measures a stage of the pipeline: wall time, CPU time of the process and of its finished child processes
+    (e.g., process pools) and the peak resident set size during the stage. Stages can be nested.
+    If name equals PROFILE_STAGE, the stage is also captured with cProfile or tracemalloc (see PROFILE_CAPTURE).
+
+    :param name: Name of the stage
+    :param labels: Additional values stored with the record (e.g., number_of_drones=10)
+    """
+    if _stack:
+        # the peak of the enclosing stage so far would be lost by the reset
+        _stack[-1]['peak_rss_mb'] = max(_stack[-1]['peak_rss_mb'], _peak_rss_mb())
+    record = {'stage': name, 'parent': _stack[-1]['stage'] if _stack else None, 'peak_rss_mb': 0.0}
+    record.update(labels)
+    record['peak_rss_scope'] = 'stage' if _reset_peak_rss() else 'process'
+
+    capture = PROFILE_STAGE == name
+    profiler = None
+    if capture and PROFILE_CAPTURE == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif capture and PROFILE_CAPTURE == 'tracemalloc':
+        tracemalloc.start()
+
+    _stack.append(record)
+    wall_start = time.perf_counter()
+    times_start = os.times()
+    try:
+        yield record
+    finally:
+        times_end = os.times()
+        record['wall_time'] = time.perf_counter() - wall_start
+        record['cpu_time'] = (times_end.user - times_start.user) + (times_end.system - times_start.system)
+        record['children_cpu_time'] = ((times_end.children_user - times_start.children_user)
+                                       + (times_end.children_system - times_start.children_system))
+        record['peak_rss_mb'] = max(record['peak_rss_mb'], _peak_rss_mb())
+        _stack.pop()
+        if _stack:
+            _stack[-1]['peak_rss_mb'] = max(_stack[-1]['peak_rss_mb'], record['peak_rss_mb'])
+
+        if profiler is not None:
+            profiler.disable()
+            filename = './results/profile_{}.prof'.format(name)
+            profiler.dump_stats(filename)
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            print(output.getvalue())
+            record['profile'] = filename
+        elif capture and PROFILE_CAPTURE == 'tracemalloc':
+            snapshot = tracemalloc.take_snapshot()
+            record['tracemalloc_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            record['tracemalloc_top'] = [{'line': str(statistic.traceback), 'size_mb': statistic.size / 2**20, 'count': statistic.count}
+                                         for statistic in snapshot.statistics('lineno')[:PROFILE_TOP]]
+            for line in record['tracemalloc_top']:
+                print('{:.1f}MB in {} blocks: {}'.format(line['size_mb'], line['count'], line['line']))
+
+        _records.append(record)
+        print('Stage {}{}: {:.2f}s wall, {:.2f}s CPU, {:.0f}MB peak RSS'.format(
+            name, ''.join(' {}={}'.format(key, value) for key, value in labels.items()),
+            record['wall_time'], record['cpu_time'] + record['children_cpu_time'], record['peak_rss_mb']))
+
+
+def records():
+    return list(_records)
+
+
+def reset():
+    """Forgets the recorded stages, e.g., before a new run in the same process."""
+    global _start
+    _records.clear()
+    _start = time.time()
+
+
+def write_report(filename, **parameters):
+    """
+    Saves the recorded stages to a JSON file together with totals per stage name.
+    :param filename: Path of the report
+    :param parameters: Parameters of the run stored in the report (e.g., the capacity of the drones)
+    """
+    totals = {}
+    for record in _records:
+        total = totals.setdefault(record['stage'], {'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'peak_rss_mb': 0.0})
+        total['count'] += 1
+        total['wall_time'] += record['wall_time']
+        total['cpu_time'] += record['cpu_time'] + record['children_cpu_time']
+        total['peak_rss_mb'] = max(total['peak_rss_mb'], record['peak_rss_mb'])
+
+    with open(filename, 'w') as f:
+        simplejson.dump({
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(_start)),
+            'wall_time': time.time() - _start,
+            'command': sys.argv,
+            'parameters': parameters,
+            'totals': totals,
+            'stages': _records,
+        }, f, indent=2)
+    print('Run report saved to {}'.format(filename))
@@ -0,0 +1,182 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import numpy as np
+import simplejson
+
+
+# A schedule file (.npz) stores the tours once, in columns, and for every number of drones only the index of
+# the drone of every tour and the total durations of the drones:
+#   route_offsets           stops of route r are stops[route_offsets[r]:route_offsets[r + 1]]
+#   stop_lat, stop_lon, stop_population, stop_load
+#   route_distance, route_load, route_number_of_stops
+#   total_load, total_distance, number_of_drones_used, total_numer_of_stops
+#   drone_counts            numbers of drones with a schedule
+#   assignment_{m}, bins_{m}  for every number of drones m
+# Every array is a separate member of the archive, so reading one of them does not read the others.
+
+
+def tours_to_columns(tours):
+    """
+    Converts tours in the format from compute_tours.py to columnar arrays.
+    :param tours: A dictionary in the format from compute_tours.py
+    :return: A dictionary of arrays
+    """
+    stops = [stop for route in tours['routes'] for stop in route['stops']]
+    return {
+        'route_offsets': np.cumsum([0] + [len(route['stops']) for route in tours['routes']], dtype=np.int64),
+        'stop_lat': np.array([stop['lat'] for stop in stops], dtype=np.float64),
+        'stop_lon': np.array([stop['lon'] for stop in stops], dtype=np.float64),
+        'stop_population': np.array([stop['Population'] for stop in stops]),
+        'stop_load': np.array([stop['load'] for stop in stops]),
+        'route_distance': np.array([route['distance'] for route in tours['routes']]),
+        'route_load': np.array([route['load'] for route in tours['routes']]),
+        'route_number_of_stops': np.array([route['number_of_stops'] for route in tours['routes']], dtype=np.int64),
+        'total_load': np.array(tours['total_load']),
+        'total_distance': np.array(tours['total_distance']),
+        'number_of_drones_used': np.array(tours['number_of_drones_used']),
+        'total_numer_of_stops': np.array(tours['total_numer_of_stops']),
+    }
+
+
+def assignment_array(jobs_assignment, number_of_jobs):
+    """Converts an assignment in the format "drone_id: [jobs_ids]" to an array with the drone of every job."""
+    assignment = np.full(number_of_jobs, -1, dtype=np.int32)
+    for drone, jobs in jobs_assignment.items():
+        assignment[np.asarray(jobs, dtype=np.int64)] = int(drone)
+    return assignment
+
+
+def save_schedules(filename, tours, schedules):
+    """
+    Saves the tours and their schedules for every number of drones to a compressed .npz file.
+    :param filename: Path of the file, ".npz" is appended by numpy if it is missing
+    :param tours: A dictionary in the format from compute_tours.py
+    :param schedules: A list of tuples (number_of_drones, jobs_assignment, bins)
+    """
+    arrays = tours_to_columns(tours)
+    arrays['drone_counts'] = np.array([number_of_drones for number_of_drones, _, _ in schedules], dtype=np.int32)
+    for number_of_drones, jobs_assignment, bins in schedules:
+        arrays['assignment_{}'.format(number_of_drones)] = assignment_array(jobs_assignment, len(tours['routes']))
+        arrays['bins_{}'.format(number_of_drones)] = np.asarray(bins, dtype=np.float64)
+
+    np.savez_compressed(filename, **arrays)
+
+
+def _python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class ScheduleReader:
+    """
+    Reads a schedule file written by save_schedules. The arrays are read from the file when they are first needed,
+    so getting the schedule for one number of drones does not read the schedules for the others.
+    """
+    def __init__(self, filename):
+        self._file = np.load(filename)
+        self._columns = {}
+        self.drone_counts = [int(x) for x in self._file['drone_counts']]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _column(self, name):
+        if name not in self._columns:
+            self._columns[name] = self._file[name]
+        return self._columns[name]
+
+    @property
+    def number_of_routes(self):
+        return len(self._column('route_distance'))
+
+    def route(self, route_id):
+        """Returns one route in the format from compute_tours.py."""
+        start, stop = self._column('route_offsets')[route_id:route_id + 2]
+        stops = [{
+            'lon': float(self._column('stop_lon')[i]),
+            'lat': float(self._column('stop_lat')[i]),
+            'Population': _python(self._column('stop_population')[i]),
+            'load': _python(self._column('stop_load')[i]),
+        } for i in range(start, stop)]
+        return {
+            'stops': stops,
+            'distance': _python(self._column('route_distance')[route_id]),
+            'load': _python(self._column('route_load')[route_id]),
+            'number_of_stops': int(self._column('route_number_of_stops')[route_id]),
+        }
+
+    def tours(self):
+        """Returns all tours in the format from compute_tours.py."""
+        return {
+            'routes': [self.route(route_id) for route_id in range(self.number_of_routes)],
+            'total_load': _python(self._column('total_load')[()]),
+            'total_distance': _python(self._column('total_distance')[()]),
+            'number_of_drones_used': _python(self._column('number_of_drones_used')[()]),
+            'total_numer_of_stops': _python(self._column('total_numer_of_stops')[()]),
+        }
+
+    def assignment(self, number_of_drones):
+        """Returns an array with the drone of every route."""
+        return self._file['assignment_{}'.format(number_of_drones)]
+
+    def bins(self, number_of_drones):
+        """Returns an array with the total duration of the routes of every drone."""
+        return self._file['bins_{}'.format(number_of_drones)]
+
+    def jobs_assignment(self, number_of_drones):
+        """Returns the assignment in the format "drone_id: [jobs_ids]" (every drone is present, idle drones have no jobs)."""
+        assignment = self.assignment(number_of_drones)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(number_of_drones + 1))
+        return {drone: [int(x) for x in order[bounds[drone]:bounds[drone + 1]]] for drone in range(number_of_drones)}
+
+    def schedule(self, number_of_drones, with_routes=True):
+        """
+        Returns the schedule for one number of drones as an entry of "assignments" of the JSON format.
+        :param number_of_drones: The number of drones
+        :param with_routes: If True, the routes of every drone are included, as in the JSON format
+        """
+        jobs_assignment = self.jobs_assignment(number_of_drones)
+        entry = {
+            'number_of_drones': number_of_drones,
+            'jobs_assignment': list(jobs_assignment.values()),
+            'bins': [float(x) for x in self.bins(number_of_drones)],
+        }
+        if with_routes:
+            entry['routes'] = [[self.route(route_id) for route_id in jobs] for jobs in jobs_assignment.values()]
+        return entry
+
+
+def export_json(filename, json_filename):
+    """
+    Converts a schedule file to the JSON format ({"assignments": [...], "all_routes": tours}) written by earlier versions.
+    :param filename: Path of the .npz schedule file
+    :param json_filename: Path of the JSON file
+    """
+    with ScheduleReader(filename) as reader:
+        tours = reader.tours()
+        results = []
+        for number_of_drones in reader.drone_counts:
+            entry = reader.schedule(number_of_drones, with_routes=False)
+            entry['routes'] = [[tours['routes'][route_id] for route_id in jobs] for jobs in entry['jobs_assignment']]
+            results.append(entry)
+
+    with open(json_filename, 'w') as f:
+        simplejson.dump({'assignments': results, 'all_routes': tours}, f)
@@ -0,0 +1,213 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import bisect
+import heapq
+import itertools
+import time
+from typing import Dict, List
+
+import numpy as np
+
+
+MULTIFIT_ITERATIONS = 10 # Number of bisection steps of MULTIFIT. After k steps the result is within 1.22 + 2^-k from the optimum
+LOCAL_SEARCH_ITERATIONS = 10000 # Maximum number of improving moves of the local search
+LOCAL_SEARCH_PATIENCE = 50 # The local search stops after this many moves in a row that do not reduce the makespan
+LOCAL_SEARCH_TIME_LIMIT = 1 # value in seconds after which the local search stops
+
+
+# All schedulers below have the same interface as run_IP in assign_tours.py: they take the number of drones and
+# a list of jobs durations and return a dictionary of assignments of drones to jobs (in the format "drone_id: [jobs_ids]")
+# and a list of total jobs durations for every drone.
+
+
+def _result(number_of_drones: int, jobs: List[float], drone_jobs: List[List[int]]):
+    drone_jobs = list(drone_jobs) + [[] for _ in range(number_of_drones - len(drone_jobs))]
+    jobs_assignment = {drone: list(assigned) for drone, assigned in enumerate(drone_jobs)}
+    bins = [float(sum(jobs[job] for job in assigned)) for assigned in drone_jobs]
+    return jobs_assignment, bins
+
+
+def lpt(number_of_drones: int, jobs: List[float]):
+    """
+    Longest Processing Time algorithm: jobs are taken from the longest one and every job is given to the least loaded drone.
+    The least loaded drone is kept on top of a heap, so it takes O(n log n + n log m) time.
+    The solution is within 4/3 - 1/(3m) from the optimum, where m is the number of drones.
+    """
+    heap = [(0.0, drone) for drone in range(number_of_drones)]
+    drone_jobs = [[] for _ in range(number_of_drones)]
+
+    for job in sorted(range(len(jobs)), key=lambda job: -jobs[job]):
+        load, drone = heapq.heappop(heap)
+        drone_jobs[drone].append(job)
+        heapq.heappush(heap, (load + jobs[job], drone))
+
+    return _result(number_of_drones, jobs, drone_jobs)
+
+
+def _first_fit_decreasing(jobs: List[float], order: List[int], number_of_drones: int, capacity: float):
+    """Packs the jobs (in the given order) into the first drone where they fit. Returns None if they do not fit into number_of_drones drones."""
+    loads = np.zeros(number_of_drones)
+    drone_jobs = [[] for _ in range(number_of_drones)]
+
+    for job in order:
+        fits = loads + jobs[job] <= capacity
+        if not fits.any():
+            return None
+        drone = int(np.argmax(fits))
+        loads[drone] += jobs[job]
+        drone_jobs[drone].append(job)
+
+    return drone_jobs
+
+
+def multifit(number_of_drones: int, jobs: List[float], iterations: int = MULTIFIT_ITERATIONS):
+    """
+    MULTIFIT algorithm: bisection over the makespan, checking every value with First Fit Decreasing bin packing.
+    The solution is within 1.22 + 2^-iterations from the optimum.
+    """
+    order = sorted(range(len(jobs)), key=lambda job: -jobs[job])
+    total = sum(jobs)
+    lower = max(max(jobs), total / number_of_drones)
+    upper = max(max(jobs), 2 * total / number_of_drones)
+    best = _first_fit_decreasing(jobs, order, number_of_drones, upper)
+
+    for _ in range(iterations):
+        capacity = (lower + upper) / 2
+        drone_jobs = _first_fit_decreasing(jobs, order, number_of_drones, capacity)
+        if drone_jobs is None:
+            lower = capacity
+        else:
+            upper = capacity
+            best = drone_jobs
+
+    return _result(number_of_drones, jobs, best)
+
+
+def karmarkar_karp(number_of_drones: int, jobs: List[float]):
+    """
+    Multi-way Karmarkar-Karp differencing: every job starts as a partial schedule with the job on one drone.
+    The two partial schedules with the largest difference between the most and the least loaded drone are merged
+    repeatedly, putting the most loaded drones of one together with the least loaded drones of the other.
+    """
+    counter = itertools.count() # breaks ties in the heap
+    heap = []
+    for job in range(len(jobs)):
+        partition = [(float(jobs[job]), [job])] + [(0.0, []) for _ in range(number_of_drones - 1)]
+        heapq.heappush(heap, (-float(jobs[job]), next(counter), partition))
+
+    if not heap:
+        return _result(number_of_drones, jobs, [])
+
+    while len(heap) > 1:
+        _, _, first = heapq.heappop(heap)
+        _, _, second = heapq.heappop(heap)
+        # both partitions are sorted from the most loaded drone
+        merged = sorted([(a[0] + b[0], a[1] + b[1]) for a, b in zip(first, reversed(second))], key=lambda x: -x[0])
+        heapq.heappush(heap, (-(merged[0][0] - merged[-1][0]), next(counter), merged))
+
+    return _result(number_of_drones, jobs, [assigned for _, assigned in heap[0][2]])
+
+
+def _best_partner(durations: List[float], job_duration: float, target: float, limit: float):
+    """
+    Finds the duration in the sorted list durations (or no job, duration 0) which makes job_duration - duration
+    closest to target while staying in (0, limit). Returns (distance to target, index or None), or None if there is no such duration.
+    """
+    best = None
+    if 0 < job_duration < limit:
+        best = (abs(job_duration - target), None)
+    position = bisect.bisect_left(durations, job_duration - target)
+    for index in (position - 1, position):
+        if 0 <= index < len(durations):
+            difference = job_duration - durations[index]
+            if 0 < difference < limit and (best is None or abs(difference - target) < best[0]):
+                best = (abs(difference - target), index)
+    return best
+
+
+def local_search(number_of_drones: int, jobs: List[float], jobs_assignment: Dict[int, List[int]],
+                 iterations: int = LOCAL_SEARCH_ITERATIONS, patience: int = LOCAL_SEARCH_PATIENCE, time_limit: float = LOCAL_SEARCH_TIME_LIMIT):
+    """
+    Improves a schedule by moving a job away from the most loaded drone, or swapping it with a shorter job
+    of another drone, as long as it reduces the load of the most loaded drone without overloading the other one.
+
+    Moving a difference d from the most loaded drone (load L) to another one (load l) is best when d is closest to (L - l) / 2,
+    so the jobs of every drone are kept sorted and the best partner of every job of the most loaded drone is found by bisection.
+    The search stops after patience moves in a row which do not reduce the makespan or after time_limit seconds.
+    """
+    drone_jobs = [sorted(jobs_assignment.get(drone, []), key=lambda job: jobs[job]) for drone in range(number_of_drones)]
+    durations = [[jobs[job] for job in assigned] for assigned in drone_jobs]
+    loads = [sum(drone_durations) for drone_durations in durations]
+    best_makespan = max(loads) if loads else 0
+    without_improvement = 0
+    deadline = time.time() + time_limit
+
+    for _ in range(iterations):
+        critical = int(np.argmax(loads))
+        best = None # (distance to the best difference, other drone, index of the job of the critical drone, index of the job of the other drone or None)
+
+        for other in range(number_of_drones):
+            if other == critical:
+                continue
+            limit = loads[critical] - loads[other]
+            if limit <= 0:
+                continue
+            for index, job_duration in enumerate(durations[critical]):
+                partner = _best_partner(durations[other], job_duration, limit / 2, limit)
+                if partner is not None and (best is None or partner[0] < best[0]):
+                    best = (partner[0], other, index, partner[1])
+
+        if best is None:
+            break
+
+        _, other, index, other_index = best
+        job = drone_jobs[critical].pop(index)
+        del durations[critical][index]
+        loads[critical] -= jobs[job]
+        loads[other] += jobs[job]
+        if other_index is not None:
+            other_job = drone_jobs[other].pop(other_index)
+            del durations[other][other_index]
+            loads[other] -= jobs[other_job]
+            loads[critical] += jobs[other_job]
+            position = bisect.bisect_left(durations[critical], jobs[other_job])
+            durations[critical].insert(position, jobs[other_job])
+            drone_jobs[critical].insert(position, other_job)
+        position = bisect.bisect_left(durations[other], jobs[job])
+        durations[other].insert(position, jobs[job])
+        drone_jobs[other].insert(position, job)
+
+        if max(loads) < best_makespan:
+            best_makespan = max(loads)
+            without_improvement = 0
+        else:
+            without_improvement += 1
+        if without_improvement >= patience or time.time() > deadline:
+            break
+
+    return _result(number_of_drones, jobs, drone_jobs)
+
+
+def best_schedule(number_of_drones: int, jobs: List[float]):
+    """
+    Runs LPT, MULTIFIT and Karmarkar-Karp, improves every schedule with the local search and returns the best one.
+    """
+    best = None
+    for scheduler in (lpt, multifit, karmarkar_karp):
+        jobs_assignment, _ = scheduler(number_of_drones, jobs)
+        jobs_assignment, bins = local_search(number_of_drones, jobs, jobs_assignment)
+        if best is None or max(bins) < max(best[1]):
+            best = jobs_assignment, bins
+
+    return best
@@ -0,0 +1,201 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import simplejson
+
+import compute_tours
+import profiling
+from distance_cache import cache_key
+from distances import is_sparse
+from prepare_data import HOSPITAL, DISTANCE_METHOD, load_data, load_distance_matrix, split_points
+
+
+SCENARIOS = None # A list of tuples of the format: (capacity, max point demand). None means the list "capacities" from assign_tours.py
+SWEEP_WORKERS = None # How many scenarios are solved at the same time. None means the number of CPUs
+MANIFEST_FILENAME = './results/sweep_manifest.json' # Records which scenarios are done, so they are skipped when the sweep is run again
+
+
+_worker_points = None
+_worker_distance_matrix = None
+_worker_shared_memory = None
+
+
+def _init_worker(points, distance_matrix, shared_memory_name, shape, dtype, matrix_filename=None):
+    """
+    Attaches a worker process to the distance matrix in shared memory, or memory-maps the cached matrix file
+    (or keeps the sparse graph it received).
+    """
+    global _worker_points, _worker_distance_matrix, _worker_shared_memory
+    _worker_points = points
+
+    if matrix_filename is not None:
+        _worker_distance_matrix = np.load(matrix_filename, mmap_mode='r')
+    elif shared_memory_name is None:
+        _worker_distance_matrix = distance_matrix
+    else:
+        _worker_shared_memory = shared_memory.SharedMemory(name=shared_memory_name)
+        _worker_distance_matrix = np.ndarray(shape, dtype=dtype, buffer=_worker_shared_memory.buf)
+
+
+def _solve_scenario(scenario):
+    """Splits the points for the scenario on top of the shared base matrix, solves the CVRP and saves the tours."""
+    drones_capacity, max_point_demand = scenario
+    start = time.time()
+    profiling.reset() # a worker process solves several scenarios one after another
+
+    full_load_capacity = drones_capacity if compute_tours.SPLIT_DELIVERY == 'full_loads' else None
+    with profiling.stage('split'):
+        points, distance_matrix, full_loads = split_points(_worker_points, _worker_distance_matrix, max_point_demand, full_load_capacity)
+        data = compute_tours.build_data_model(points, distance_matrix, drones_capacity, full_loads)
+    filename = compute_tours.solution_filename(drones_capacity, max_point_demand)
+    routes = compute_tours.solve_and_save(data, filename, compute_tours.HEURISTIC_TIME_LIMIT)
+    profiling.write_report(filename.replace('.json', '_profile.json'), drones_capacity=drones_capacity, max_point_demand=max_point_demand)
+
+    return {
+        'status': 'done' if routes is not None else 'failed',
+        'output': filename,
+        'number_of_routes': len(routes) if routes is not None else None,
+        'wall_time': time.time() - start,
+    }
+
+
+def input_key(all_points, neighbours):
+    """
+    Computes a key identifying everything the tours of a scenario depend on besides the scenario itself:
+    the coordinates and the population of the points, the depot, the distances and the settings of compute_tours.py.
+    A scenario which is done is solved again when the key changes.
+    """
+    method = DISTANCE_METHOD if neighbours is None else 'knn_{}'.format(neighbours)
+    settings = [compute_tours.SPLIT_DELIVERY, compute_tours.HEURISTIC_TIME_LIMIT, compute_tours.TRANSIT_MODE,
+                compute_tours.DISTANCE_SCALE, compute_tours.MAX_NUMBER_OF_STOPS, compute_tours.FLEET_MARGIN,
+                compute_tours.DECOMPOSITION_SECTORS, compute_tours.MULTILEVEL_RATIO, compute_tours.PORTFOLIO]
+    h = hashlib.sha256(cache_key(all_points.lat, all_points.lon, HOSPITAL, method).encode())
+    h.update(np.ascontiguousarray(all_points.population, dtype=np.int64).tobytes())
+    h.update(simplejson.dumps(settings).encode())
+    return h.hexdigest()[:32]
+
+
+def scenario_name(scenario):
+    return '{}_{}'.format(*scenario)
+
+
+def load_manifest(filename=MANIFEST_FILENAME):
+    if not os.path.exists(filename):
+        return {'scenarios': {}}
+    with open(filename, 'r') as f:
+        return simplejson.load(f)
+
+
+def save_manifest(manifest, filename=MANIFEST_FILENAME):
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w') as f:
+        simplejson.dump(manifest, f, indent=2)
+    os.replace(tmp_filename, filename)
+
+
+def is_done(manifest, scenario, key):
+    """A scenario is done if it was solved for the same input and its tours are still on the disk."""
+    entry = manifest['scenarios'].get(scenario_name(scenario))
+    return (entry is not None and entry['status'] == 'done' and entry.get('input') == key
+            and os.path.exists(entry['output']))
+
+
+def run_sweep(scenarios, workers=SWEEP_WORKERS, use_cache=compute_tours.USE_CACHE, neighbours=compute_tours.SPARSE_NEIGHBOURS):
+    """
+    Solves the CVRP for several scenarios at the same time, each in its own process.
+    The points are loaded and the distance matrix (before splitting) is computed once and placed in shared memory
+    (or, if it comes from the cache, memory-mapped from the cache file by every worker),
+    every worker splits the points for its scenario on top of it without copying the matrix.
+
+    :param scenarios: A list of tuples (capacity, max point demand)
+    :param workers: How many scenarios are solved at the same time. None means the number of CPUs.
+    :param use_cache: If True then the distance matrix is taken from (or stored in) the cache
+    :param neighbours: If set to an integer k, a sparse k-nearest-neighbours graph is used instead of the dense matrix
+    :return: The manifest with the status of every scenario
+    """
+    all_points = load_data()
+    key = input_key(all_points, neighbours)
+    manifest = load_manifest()
+
+    pending = [scenario for scenario in scenarios if not is_done(manifest, scenario, key)]
+    for scenario in scenarios:
+        if scenario not in pending:
+            print('Capacity {}, max point demand {}: already done, skipping'.format(*scenario))
+    if not pending:
+        return manifest
+
+    distance_matrix = load_distance_matrix(all_points, use_cache=use_cache, neighbours=neighbours)
+    matrix_shared_memory = None
+
+    try:
+        if is_sparse(distance_matrix):
+            # the sparse graph is small, so every worker simply gets its own copy
+            initargs = (all_points, distance_matrix, None, None, None)
+        elif isinstance(distance_matrix, np.memmap) and distance_matrix.filename is not None:
+            # a matrix from the cache is a read-only memory map, the workers map the same file and share its pages
+            initargs = (all_points, None, None, None, None, distance_matrix.filename)
+        else:
+            matrix_shared_memory = shared_memory.SharedMemory(create=True, size=max(1, distance_matrix.nbytes))
+            shared_matrix = np.ndarray(distance_matrix.shape, dtype=distance_matrix.dtype, buffer=matrix_shared_memory.buf)
+            shared_matrix[:] = distance_matrix
+            del shared_matrix
+            initargs = (all_points, None, matrix_shared_memory.name, distance_matrix.shape, distance_matrix.dtype)
+        del distance_matrix
+
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        print('Solving {} scenarios with {} workers'.format(len(pending), workers))
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+            futures = {}
+            for scenario in pending:
+                futures[executor.submit(_solve_scenario, scenario)] = scenario
+                manifest['scenarios'][scenario_name(scenario)] = {'status': 'running', 'input': key,
+                                                                  'output': compute_tours.solution_filename(*scenario)}
+            save_manifest(manifest)
+
+            for done, future in enumerate(as_completed(futures), 1):
+                scenario = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    entry = {'status': 'failed', 'error': repr(e)}
+                entry['input'] = key
+                manifest['scenarios'][scenario_name(scenario)].update(entry)
+                save_manifest(manifest)
+                print('[{}/{}] Capacity {}, max point demand {}: {}'.format(done, len(pending), scenario[0], scenario[1], entry['status']))
+    finally:
+        if matrix_shared_memory is not None:
+            matrix_shared_memory.close()
+            matrix_shared_memory.unlink()
+
+    return manifest
+
+
+def main():
+    scenarios = SCENARIOS
+    if scenarios is None:
+        from assign_tours import capacities
+        scenarios = capacities
+
+    run_sweep(scenarios)
+
+
+if __name__ == '__main__':
+    main()
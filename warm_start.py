@@ -0,0 +1,136 @@
+# We publish the code under MIT license as it is the most permissible license we have managed to find and because Free Software Foundation **does not recommend** using informal licenses like "Do whatever you want" (https://www.gnu.org/licenses/license-list.en.html#informal).
+#
+# However, our knowledge in the area of licensing is limited, therefore feel free to contact the authors if you feel that this license does not work.
+#
+# Copyright 2020 https://github.com/undefiened/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated documentation files (the "Software"), to deal in the Software without restriction, including without limitation the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+from collections import defaultdict, deque
+
+import simplejson
+
+
+def load_previous_routes(filename):
+    """
+    Loads the tours computed earlier by compute_tours.py.
+    :param filename: Path to a results/capacity_{}_{}.json file
+    :return: A list of routes, every route is a list of stops (dictionaries with "lat" and "lon") starting at the depot
+    """
+    with open(filename, 'r') as f:
+        return [route['stops'] for route in simplejson.load(f)['routes']]
+
+
+def map_routes_to_nodes(previous_routes, data):
+    """
+    Maps the stops of previous tours to the nodes of a new data model by their coordinates.
+    A split point has several nodes with the same coordinates, every stop takes one of them which is not taken yet.
+    Stops at points which do not exist anymore (or which have fewer nodes now) are dropped.
+
+    :param previous_routes: Routes as returned by load_previous_routes
+    :param data: The new data model
+    :return: A list of routes (lists of node indices without the depot) and the number of dropped stops
+    """
+    points = data['all_points']
+    free_nodes = defaultdict(deque)
+    for node in range(len(data['demands'])):
+        if node != data['depot'] and data['demands'][node] > 0:
+            free_nodes[(float(points.lat[node]), float(points.lon[node]))].append(node)
+
+    routes = []
+    dropped = 0
+    for stops in previous_routes:
+        route = []
+        for stop in stops:
+            nodes = free_nodes.get((stop['lat'], stop['lon']))
+            if nodes:
+                route.append(nodes.popleft())
+            elif stop.get('Population', 0) > 0:
+                dropped += 1
+        routes.append(route)
+
+    return routes, dropped
+
+
+def repair_routes(routes, data):
+    """
+    Makes the mapped routes a feasible solution of the new data model:
+    stops which do not fit in the capacity or the maximum number of stops of a drone anymore are removed from the route,
+    and all nodes which are not visited (removed stops and new points) are inserted where it increases
+    the distance the least. If a node does not fit in any route, a new route is opened.
+
+    :param routes: A list of routes (lists of node indices without the depot)
+    :param data: The data model
+    :return: A list of non-empty feasible routes (lists of node indices without the depot)
+    """
+    depot = data['depot']
+    distance_matrix = data['distance_matrix']
+    capacity = data['vehicle_capacities'][0]
+    max_number_of_stops = data['vehicle_max_number_of_stops'][0]
+
+    loads = []
+    stops = []
+    visited = set()
+    repaired = []
+    for route in routes:
+        load = 0
+        number_of_stops = 0
+        kept = []
+        for node in route:
+            if load + data['demands'][node] > capacity or number_of_stops + data['counter'][node] > max_number_of_stops:
+                continue
+            load += data['demands'][node]
+            number_of_stops += data['counter'][node]
+            kept.append(node)
+        if kept:
+            repaired.append(kept)
+            loads.append(load)
+            stops.append(number_of_stops)
+            visited.update(kept)
+
+    unvisited = [node for node in range(len(data['demands'])) if node != depot and node not in visited]
+
+    for node in unvisited:
+        best = None
+        for route_id, route in enumerate(repaired):
+            if loads[route_id] + data['demands'][node] > capacity or stops[route_id] + data['counter'][node] > max_number_of_stops:
+                continue
+            path = [depot] + route + [depot]
+            for position in range(len(path) - 1):
+                cost = (distance_matrix[path[position], node] + distance_matrix[node, path[position + 1]]
+                        - distance_matrix[path[position], path[position + 1]])
+                if best is None or cost < best[0]:
+                    best = (cost, route_id, position)
+
+        if best is None:
+            repaired.append([node])
+            loads.append(data['demands'][node])
+            stops.append(data['counter'][node])
+            continue
+
+        _, route_id, position = best
+        repaired[route_id].insert(position, node)
+        loads[route_id] += data['demands'][node]
+        stops[route_id] += data['counter'][node]
+
+    return repaired
+
+
+def initial_routes(filename, data):
+    """
+    Loads previous tours and turns them into feasible routes of the new data model which can seed the solver.
+    :param filename: Path to a results/capacity_{}_{}.json file
+    :param data: The new data model
+    :return: A list of routes (lists of node indices without the depot)
+    """
+    routes, dropped = map_routes_to_nodes(load_previous_routes(filename), data)
+    mapped = sum(len(route) for route in routes)
+    routes = repair_routes(routes, data)
+    print('Warm start from {}: {} stops mapped, {} stops dropped, {} nodes inserted, {} routes'.format(
+        filename, mapped, dropped, sum(len(route) for route in routes) - mapped, len(routes)))
+    return routes